@@ -9,12 +9,58 @@
 # This module exposes the ByteCode class to generate Andes Controller USB bytecode.
 
 import struct as struct;
-import six as six;
 
 
 ## Generates bytecode ready for USB communication usage.
 # Handles endianess and communication protocol internally.
-class ByteCode:
+class ByteCode(object):
+
+	## Every attribute a ByteCode holds. Instances have no __dict__, so attribute
+	# lookups on the bytecode building paths are plain slot accesses.
+	__slots__ = \
+	( \
+		'endianess',
+		'_pack_u4',
+		'_pack_i4',
+		'_init_b',
+		'_configurator_mod_b',
+		'_acquisition_mod_b',
+		'_pvm_mod_b',
+		'_len1_b',
+		'_len2_b',
+		'_len3_b',
+		'_len4_b',
+		'_len5_b',
+		'_configurator_powermanag_index',
+		'_configurator_spivideo_index',
+		'_configurator_spibiasclocks_index',
+		'_acquisition_sequencer_index',
+		'_pvm_uartmicro_index',
+		'_configurator_powermanag_readpowerenablereg_inst',
+		'_configurator_powermanag_enablepower_inst',
+		'_configurator_powermanag_resetdacs_inst',
+		'_configurator_spivideo_communicate_inst',
+		'_configurator_spibiasclocks_communicate_inst',
+		'_acquisition_sequencer_getimage_inst',
+		'_acquisition_sequencer_writeseqmem_inst',
+		'_acquisition_sequencer_enableseq_inst',
+		'_acquisition_sequencer_disableseq_inst',
+		'_acquisition_sequencer_writeexpotime_inst',
+		'_acquisition_sequencer_getpxlsch1_inst',
+		'_acquisition_sequencer_getpxlsch3_inst',
+		'_acquisition_sequencer_getdatach1_inst',
+		'_acquisition_sequencer_getdatach3_inst',
+		'_acquisition_sequencer_tstseqon_inst',
+		'_acquisition_sequencer_tstseqoff_inst',
+		'_pvm_uartmicro_senddata_inst',
+		'_pvm_uartmicro_readmemory_inst',
+		'_default_error',
+		'_timeout_error',
+		'_default_ok',
+		'_expose_busy',
+		'_expose_done',
+		'_resp_disabled' \
+	);
 
 	## Initializes a ByteCode.
 	#
@@ -24,13 +70,23 @@ class ByteCode:
 		# Byte order
 		self.endianess                = endianess;    # <: little endian
 
+		self._pack_u4                 = struct.Struct(endianess + 'I').pack;
+		self._pack_i4                 = struct.Struct(endianess + 'i').pack;
+
 		# Init word
-		self._init                    = self.int_to_byte_list(0x029A);
+		self._init_b                  = self._pack_u4(0x029A);
 
 		# Module select codes
-		self._configurator_mod_index  = self.int_to_byte_list(0);
-		self._acquisition_mod_index   = self.int_to_byte_list(1);
-		self._pvm_mod_index           = self.int_to_byte_list(2);
+		self._configurator_mod_b      = self._pack_u4(0);
+		self._acquisition_mod_b       = self._pack_u4(1);
+		self._pvm_mod_b               = self._pack_u4(2);
+
+		# Instruction lengths (in words, header included)
+		self._len1_b                  = self._pack_u4(1);
+		self._len2_b                  = self._pack_u4(2);
+		self._len3_b                  = self._pack_u4(3);
+		self._len4_b                  = self._pack_u4(4);
+		self._len5_b                  = self._pack_u4(5);
 
 		# Sub-module select codes
 		self._configurator_powermanag_index    = 0
@@ -81,18 +137,18 @@ class ByteCode:
 	#
 	# @returns A list of ints containing the byte-by-byte representation.
 	def int_to_byte_list(self, number, n_bytes = 4, signed=False):
-		num_type = 'I';
+		pack = self._pack_u4;
 		if(signed):
-			num_type = 'i';
+			pack = self._pack_i4;
 
 		if(n_bytes == 4):
-			return tuple(six.byte2int(b) for b in struct.pack(self.endianess + num_type, number));
+			return tuple(bytearray(pack(number)));
 
 		elif(n_bytes == 8):
 			number_h = (number & 0xFFFFFFFF00000000) >> 32;
 			number_l =  number & 0x00000000FFFFFFFF;
-			complete = struct.pack(self.endianess + num_type, number_h) + struct.pack(self.endianess + num_type, number_l);
-			return tuple(six.byte2int(b) for b in complete);
+			complete = pack(number_h) + pack(number_l);
+			return tuple(bytearray(complete));
 
 		else:
 			raise ValueError('Only 4 and 8 n_bytes supported');
@@ -109,35 +165,31 @@ class ByteCode:
 		return ((header_s << 16) & 0xFFFF0000) + (header_i & 0x0000FFFF);
 
 
-	## Transforms a group of ints into a str (byte in python 3)
-	#
-	# The ints must fit in a byte.
+	## Joins a group of already packed words into a single instruction.
 	#
 	# @param self An instance of ByteCode.
-	# @param *words (int) The ints to code.
+	# @param *words (str/bytes) The packed words, in transfer order.
 	#
-	# @returns The code (str/bytes) associated with the ints group.
+	# @returns The code (str/bytes) associated with the words group.
 	def _return_op(self, *words):
-		result = tuple( [six.int2byte(byte) for word in words for byte in word] );
-		return ''.join(result);
+		return b''.join(words);
 
 
 	## Boilerplate function for header-only instructons.
 	#
 	# @param self An instance of ByteCode.
-	# @param module_code (int) The index byte list code of the module the instruction is directed to.
+	# @param module_code (str/bytes) The packed index code of the module the instruction is directed to.
 	# @param header_s (int) The code of the header submodule.
 	# @param header_i (int) The code of the header instruction.
 	#
 	# @returns A list of codes ([int]).
 	def _only_header_instruction(self, module_code, header_s, header_i):
-		result =  [ \
-								self._init,
+		return self._return_op( \
+								self._init_b,
 								module_code,
-								self.int_to_byte_list(1), 
-								self.int_to_byte_list(self._header_build(header_s, header_i)) \
-							];
-		return self._return_op(*result);
+								self._len1_b, 
+								self._pack_u4(self._header_build(header_s, header_i)) \
+							);
 
 
 	## Parses lines of bytecode into hexadecimal strings
@@ -150,22 +202,56 @@ class ByteCode:
 	#
 	# @returns The hexadecimal representation (str) of bytecode_lines
 	def as_legacy_file(self, bytecode_lines, word_separator = ' ', line_separator = '\n', word_len = 4):
-		flip = '>' != self.endianess;
-
+		# Collect the pieces of text in a single list, joined once at the end.
 		program_str = [];
+		write = program_str.append;
 		line_n = 1
 		for line in bytecode_lines:
-			words = [line[ii:(ii+word_len)] for ii in six.moves.range(0, len(line), word_len)];
-			line_str = [];
-			for word in words:
-				word = [ord(b) for b in word];
-				if(flip):
-					word = reversed(word);
-				line_str.append(''.join(['{0:02X}'.format(b) for b in word]));
-			program_str.append('%03i:\t'%line_n + word_separator.join(line_str));
+			if(line_n > 1):
+				write(line_separator);
+			write('%03i:\t' % line_n);
+			write(self._format_words(line, word_separator, word_len));
 			line_n += 1
-		
-		return line_separator.join(program_str);
+
+		return ''.join(program_str);
+
+	## Parses a single line of bytecode into an hexadecimal string.
+	#
+	# Same as `as_legacy_file([line])`, without wrapping the line in a list.
+	#
+	# @param self An instance of ByteCode.
+	# @param line (str) The bytecode line to transform.
+	# @param word_separator (str) String to add between binary words.
+	# @param line_n (int) Line number to print before the words.
+	# @param word_len (int) The length (in bytes) of a binary word.
+	#
+	# @returns The hexadecimal representation (str) of line
+	def as_legacy_line(self, line, word_separator = ' ', line_n = 1, word_len = 4):
+		return ('%03i:\t' % line_n) + self._format_words(line, word_separator, word_len);
+
+	## Formats the words of a bytecode line as hexadecimal.
+	# @note For internal use only.
+	#
+	# @param self An instance of ByteCode.
+	# @param line (str) The bytecode line to transform.
+	# @param word_separator (str) String to add between binary words.
+	# @param word_len (int) The length (in bytes) of a binary word.
+	#
+	# @returns The hexadecimal words (str) of line
+	def _format_words(self, line, word_separator, word_len):
+		flip = '>' != self.endianess;
+		if(word_len == 4 and len(line) % 4 == 0):
+			# 32 bits words are read as a whole: reading them little endian is the same as flipping their bytes.
+			words = struct.unpack(('<' if flip else '>') + str(len(line) // 4) + 'I', line);
+			return word_separator.join(['%08X' % w for w in words]);
+
+		words = [];
+		for ii in range(0, len(line), word_len):
+			word = bytearray(line[ii:(ii+word_len)]);
+			if(flip):
+				word.reverse();
+			words.append(''.join(['{0:02X}'.format(b) for b in word]));
+		return word_separator.join(words);
 
 
 	# --- Configurator module instructions -------------------------------------
@@ -199,14 +285,13 @@ class ByteCode:
 		header_instruction = self._configurator_powermanag_enablepower_inst;
 		pwrState           = 1 if pwrOn else 0;
 		
-		result =  [ \
-					self._init,
-					self._configurator_mod_index, 
-					self.int_to_byte_list(2), 
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list(pwrState) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._configurator_mod_b, 
+					self._len2_b, 
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4(pwrState) \
+					);
 
 
 	## Generate the codes needed to reset all dacs devices
@@ -215,8 +300,8 @@ class ByteCode:
 	#
 	# @returns A list of codes ([int]).
 	def dacs_pwr_reset(self):
-		#return self._only_header_instruction(self._configurator_mod_index, 0, 6);
-		return self._only_header_instruction(self._configurator_mod_index, self._configurator_powermanag_index, self._configurator_powermanag_resetdacs_inst);
+		#return self._only_header_instruction(self._configurator_mod_b, 0, 6);
+		return self._only_header_instruction(self._configurator_mod_b, self._configurator_powermanag_index, self._configurator_powermanag_resetdacs_inst);
 
 
 	# --- SPI Video submodule instructions -------------------------------------
@@ -231,15 +316,14 @@ class ByteCode:
 	def configurator_spi_video(self, device, polarity, nbits, data):
 		header_submodule    = self._configurator_spivideo_index;
 		header_instruction  = self._configurator_spivideo_communicate_inst;
-		result =  [ \
-					self._init,
-					self._configurator_mod_index,
-					self.int_to_byte_list(3),
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list( ((device<<16)&0x00FF0000) + ((polarity<<8)&0x0000FF00) + (nbits&0x000000FF) ),
-					self.int_to_byte_list(data) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._configurator_mod_b,
+					self._len3_b,
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4( ((device<<16)&0x00FF0000) + ((polarity<<8)&0x0000FF00) + (nbits&0x000000FF) ),
+					self._pack_u4(data) \
+					);
 
 
 	# --- SPI Bias Clocks submodule instructions -------------------------------
@@ -254,15 +338,14 @@ class ByteCode:
 	def configurator_spi_bias_clocks(self, device, polarity, nbits, data):
 		header_submodule    = self._configurator_spibiasclocks_index
 		header_instruction  = self._configurator_spibiasclocks_communicate_inst
-		result =  [ \
-					self._init,
-					self._configurator_mod_index, 
-					self.int_to_byte_list(3), 
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list( ((device<<16)&0x00FF0000) + ((polarity<<8)&0x0000FF00) + (nbits&0x000000FF) ),
-					self.int_to_byte_list(data) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._configurator_mod_b, 
+					self._len3_b, 
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4( ((device<<16)&0x00FF0000) + ((polarity<<8)&0x0000FF00) + (nbits&0x000000FF) ),
+					self._pack_u4(data) \
+					);
 
 
 	# --- Acquisition module instructions --------------------------------------
@@ -281,16 +364,15 @@ class ByteCode:
 		header_instruction = self._acquisition_sequencer_getimage_inst;  #0;
 		shutter_state      = int(bool(open_shutter));
 
-		result =  [ \
-					self._init,
-					self._acquisition_mod_index, 
-					self.int_to_byte_list(4),    #2 
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list(stop_cleaning_mode_dir),
-					self.int_to_byte_list(get_image_mode_dir),
-					self.int_to_byte_list(shutter_state) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._acquisition_mod_b, 
+					self._len4_b,    #2 
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4(stop_cleaning_mode_dir),
+					self._pack_u4(get_image_mode_dir),
+					self._pack_u4(shutter_state) \
+					);
 
 
 	## Generate the codes needed to write the sequencer memory
@@ -306,17 +388,49 @@ class ByteCode:
 		data1 = int( (data >> 64) & 0x0000000000000000FFFFFFFF );	# MSB
 		data2 = int( (data >> 32) & 0x0000000000000000FFFFFFFF );
 		data3 = int(  data        & 0x0000000000000000FFFFFFFF );	# LSB
-		result =  [ \
-					self._init,
-					self._acquisition_mod_index,
-					self.int_to_byte_list(5),
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list(address),
-					self.int_to_byte_list(data1),
-					self.int_to_byte_list(data2),
-					self.int_to_byte_list(data3) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._acquisition_mod_b,
+					self._len5_b,
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4(address),
+					self._pack_u4(data1),
+					self._pack_u4(data2),
+					self._pack_u4(data3) \
+					);
+
+
+	## Generate the codes needed to write a whole program in the sequencer memory
+	#
+	# Gives the same lines as calling write_sequencer_memory on consecutive addresses, but the
+	# instruction header is built once and each line is packed with a single struct call.
+	#
+	# @param self An instance of ByteCode.
+	# @param codes ([int...]) Data of each address (3 words long (3x32=96bits)).
+	# @param first_address (int) Address of the sequencer memory where codes[0] is written.
+	#
+	# @returns A list of codes ([str...]), one for each address.
+	def write_sequencer_program(self, codes, first_address = 0):
+		header_submodule    = self._acquisition_sequencer_index;			 #0;
+		header_instruction  = self._acquisition_sequencer_writeseqmem_inst;	 #1;
+		header = self._return_op( \
+					self._init_b,
+					self._acquisition_mod_b,
+					self._len5_b,
+					self._pack_u4(self._header_build(header_submodule, header_instruction)) \
+					);
+		pack = struct.Struct(self.endianess + '4I').pack;
+
+		result = [];
+		address = first_address;
+		for data in codes:
+			result.append(header + pack( \
+					address,
+					int( (data >> 64) & 0xFFFFFFFF ),	# MSB
+					int( (data >> 32) & 0xFFFFFFFF ),
+					int(  data        & 0xFFFFFFFF ) ));	# LSB
+			address += 1;
+		return result;
 
 
 	## Generate the codes needed to enable the sequencer
@@ -325,7 +439,7 @@ class ByteCode:
 	#
 	# @returns A list of codes ([int]).
 	def enable_sequencer(self):
-		return self._only_header_instruction(self._acquisition_mod_index, self._acquisition_sequencer_index, self._acquisition_sequencer_enableseq_inst);
+		return self._only_header_instruction(self._acquisition_mod_b, self._acquisition_sequencer_index, self._acquisition_sequencer_enableseq_inst);
 
 
 	## Generate the codes needed to disable the sequencer
@@ -334,7 +448,7 @@ class ByteCode:
 	#
 	# @returns A list of codes ([int]).
 	def disable_sequencer(self):
-		return self._only_header_instruction(self._acquisition_mod_index, self._acquisition_sequencer_index, self._acquisition_sequencer_disableseq_inst);
+		return self._only_header_instruction(self._acquisition_mod_b, self._acquisition_sequencer_index, self._acquisition_sequencer_disableseq_inst);
 
 
 	## Generate the codes needed set the exposition time.
@@ -346,14 +460,13 @@ class ByteCode:
 	def write_exposition_time(self, time):
 		header_submodule    = self._acquisition_sequencer_index; #0;
 		header_instruction  = self._acquisition_sequencer_writeexpotime_inst; #4;
-		result =  [ \
-					self._init,
-					self._acquisition_mod_index, 
-					self.int_to_byte_list(2),
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list(time) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._acquisition_mod_b, 
+					self._len2_b,
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4(time) \
+					);
 
 
 	# Generate the codes needed to execute a sequencer mode that streams pixels.
@@ -365,13 +478,12 @@ class ByteCode:
 	def get_pixels_channel(self, channel_1or3=True):
 		header_submodule   = self._acquisition_sequencer_index;  #0;
 		header_instruction = self._acquisition_sequencer_getpxlsch1_inst if channel_1or3 else self._acquisition_sequencer_getpxlsch3_inst
-		result =  [ \
-					self._init,
-					self._acquisition_mod_index, 
-					self.int_to_byte_list(1), 
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._acquisition_mod_b, 
+					self._len1_b, 
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					);
 
 
 	# Generate the codes needed to execute a sequencer mode that streams pixels.
@@ -384,14 +496,13 @@ class ByteCode:
 	def get_data_channel(self, channel_1or3=True, samples=0):
 		header_submodule   = self._acquisition_sequencer_index;  #0;
 		header_instruction = self._acquisition_sequencer_getdatach1_inst if channel_1or3 else self._acquisition_sequencer_getdatach3_inst
-		result =  [ \
-					self._init,
-					self._acquisition_mod_index, 
-					self.int_to_byte_list(2), 
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list(samples) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._acquisition_mod_b, 
+					self._len2_b, 
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4(samples) \
+					);
 
 
 	## Generate the codes needed to test the sequencer clocks
@@ -405,16 +516,15 @@ class ByteCode:
 	def test_sequencer_on(self, time, states_high, states_low):
 		header_submodule    = self._acquisition_sequencer_index;
 		header_instruction  = self._acquisition_sequencer_tstseqon_inst;
-		result =  [ \
-					self._init,
-					self._acquisition_mod_index, 
-					self.int_to_byte_list(4), 
-					self.int_to_byte_list(self._header_build(header_submodule, header_instruction)),
-					self.int_to_byte_list(time),
-					self.int_to_byte_list(states_high),
-					self.int_to_byte_list(states_low) \
-					];
-		return self._return_op(*result);
+		return self._return_op( \
+					self._init_b,
+					self._acquisition_mod_b, 
+					self._len4_b, 
+					self._pack_u4(self._header_build(header_submodule, header_instruction)),
+					self._pack_u4(time),
+					self._pack_u4(states_high),
+					self._pack_u4(states_low) \
+					);
 
 
 	## Generate the codes needed to disable clock testing
@@ -423,7 +533,7 @@ class ByteCode:
 	#
 	# @returns A list of codes ([int]).
 	def test_sequencer_off(self):
-		return self._only_header_instruction(self._acquisition_mod_index, self._acquisition_sequencer_index, self._acquisition_sequencer_tstseqoff_inst);
+		return self._only_header_instruction(self._acquisition_mod_b, self._acquisition_sequencer_index, self._acquisition_sequencer_tstseqoff_inst);
 
 
 	# --- PVM module instructions ----------------------------------------------
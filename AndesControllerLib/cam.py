@@ -10,18 +10,52 @@
 
 
 import time as time;
-import six as six;
-import struct as struct;
+import multiprocessing as multiprocessing;
+import binascii as binascii;
 import numpy as np;
+try:
+	import queue as queue;
+except ImportError:
+	import Queue as queue;
 
 import log as log;
 import ccd as ccd;
 import binary as binary;
 import shutter as shutter;
 
+## First word of a successful camera response.
+# @note For internal use only.
+_success_head  = b'\x55'*4;
+## Zero padding that follows the first word of a successful camera response.
+# @note For internal use only.
+_success_tail  = b'\x00'*(512 - 4);
 ## What is to be expected to get as a camera response for each instruction of configuration.
 # @note For internal use only.
-_success_cache = '\x55'*4 + '\x00'*(512 - 4);     # It reads 512 bytes at once
+_success_cache = _success_head + _success_tail;     # It reads 512 bytes at once
+
+## Checks if a camera response is a success response.
+#
+# Equivalent to `response == _success_cache`, but both ends are compared in place against
+# the precomputed head and tail, without building slices of the response.
+# @note For internal use only.
+#
+# @param response (str/bytes) The response received.
+#
+# @returns True if the response is a success, False otherwise.
+def _is_success(response):
+	return len(response) == len(_success_cache) and \
+		response.startswith(_success_head) and \
+		response.endswith(_success_tail);
+
+
+## Formats the first word of a camera response, to report unexpected responses.
+# @note For internal use only.
+#
+# @param response (str/bytes) The response received.
+#
+# @returns The hexadecimal representation (str) of the first 4 bytes.
+def _format_response_head(response):
+	return binascii.hexlify(bytes(response[:4])).decode('ascii');
 
 
 ## USB/DEBUG. In debug mode, the program doesn't try to connect to the real USB camera.
@@ -54,6 +88,13 @@ class Camera:
 	## The USB interface number the camera uses
 	_interface = 0;
 
+	## Maximum size (in bytes) of each bulk transfer used to read an image.
+	_image_transfer_size = 1 << 18;
+	## Number of image bulk transfers kept in flight.
+	_image_pararell_transfers = 8;
+	## Time (in ms) allowed to each image transfer on top of the exposition time.
+	_image_timeout_ms = 1000;
+
 	## Initializes a new camera
 	# @param self An instance of Camera.
 	# @param ccd A _CCD object to manage ccd configuration and usage.
@@ -69,6 +110,12 @@ class Camera:
 		self.ccd         = ccd;
 		self.shutter     = shutter;
 		self.formatter   = formatter;
+		self._configuration_cache = None;
+		self._picture_bytecodes_cache = None;
+		self._device      = None;
+		self._device_lost = False;
+		self._port_write  = None;
+		self._port_read   = None;
 		if USB_MODE:
 			self.context = usb.USBContext();
 
@@ -96,9 +143,42 @@ class Camera:
 	# @param traceback The stack information of the raised exception. None if no error happened.
 	def __exit__(self, exception_type, exception_value, traceback):
 		if USB_MODE:
+			self._release_device(exception_type, exception_value, traceback);
 			self.context.__exit__(exception_type, exception_value, traceback);
 		return self;
 
+	## Gets the USB device of the camera, it is opened on first use and kept open.
+	#
+	# The device is reopened if the camera was unplugged since it was opened.
+	#
+	# @param self An instance of Camera.
+	#
+	# @returns The opened device (usb.Device).
+	def _get_device(self):
+		if(self._device_lost):
+			self._release_device();
+		if(self._device is None):
+			self._device = usbEasy.Device(vid = self._vid, pid = self._pid, context = self.context).__enter__();
+			self._device_lost = False;
+			self._port_write  = self._device.open_port(self._write_address);
+			self._port_read   = self._device.open_port(self._read_address);
+		return self._device;
+
+	## Releases the USB device of the camera, if it is opened.
+	#
+	# @param self An instance of Camera.
+	# @param exception_type The type of the raised exception. None if no error happened.
+	# @param exception_value The object of the raised exception. None if no error happened.
+	# @param traceback The stack information of the raised exception. None if no error happened.
+	def _release_device(self, exception_type = None, exception_value = None, traceback = None):
+		device = self._device;
+		self._device      = None;
+		self._device_lost = False;
+		self._port_write  = None;
+		self._port_read   = None;
+		if(device is not None):
+			device.__exit__(exception_type, exception_value, traceback);
+
 	## Function to call when the camera is plugged-in.
 	# @param self An instance of Camera.
 	# @param fn A parameter-less function (or an object-bounded function with just 'self').
@@ -126,6 +206,8 @@ class Camera:
 				if(hasattr(self, 'on_connect_fn')):
 					self.on_connect_fn();
 			elif(event == usb.HOTPLUG_EVENT_DEVICE_LEFT):
+				# This may run on the device event thread, so just flag the device for release.
+				self._device_lost = True;
 				if(hasattr(self, 'on_disconnect_fn')):
 					self.on_disconnect_fn();
 
@@ -141,65 +223,63 @@ class Camera:
 		formatter = self.formatter;
 		line = formatter.configurator_power_on(state);
 		successful_transfers = 0;		
+		verbose = VERBOSE and self.log.enabled(4);
 		
 		if USB_MODE:
-			with usbEasy.Device(vid = self._vid, pid = self._pid, context = self.context) as dev:
-				port_write = dev.open_port(self._write_address);
-				port_read  = dev.open_port(self._read_address);
-				if VERBOSE:
-					self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
-				successful_transfers += port_write.write_sync(line);
-				if VERBOSE:
-					self.log.info( 'Sent [bytes]: ' + str(successful_transfers) )
-				response = port_read.read_sync(1024)
-				if VERBOSE:
-					self.log.info( 'Received: ' + str(response) )
-				if(response == _success_cache):
-					self.log.info('Received SUCCESS !', 10);
-				else:
-					self.log.error('Received ERROR !: (len ' + str(len(response)) + ') ' + str(list(response[:4])), 1);
+			self._get_device();
+			port_write = self._port_write;
+			port_read  = self._port_read;
+			if verbose:
+				self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
+			successful_transfers += port_write.write_sync(line);
+			if verbose:
+				self.log.info('Sent [bytes]: %d', 4, successful_transfers);
+			response = port_read.read_sync(1024)
+			if verbose:
+				self.log.info('Received: %s', 4, response);
+			if(_is_success(response)):
+				self.log.info('Received SUCCESS !', 10);
+			else:
+				self.log.error('Received ERROR !: (len %d) %s', 1, len(response), log.Lazy(lambda: _format_response_head(response)));
 		else:
-			self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
+			self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
 	
 
 
 
 
-	# function to debbug DAC behaviour
-	# created 03-02-18 by WAC
+	## Sets the voltage of a single bias DAC, to debug the DAC behaviour.
+	# Created 03-02-18 by WAC
 	#
+	# @warning Look at the Camera class warning
+	#
+	# @param self An instance of Camera
+	# @param label (str) Name of the bias DAC, a key of the ccd bias parameters (ex. 'BHV1A').
+	# @param value (float) Voltage to set.
 	def set_specific_voltaje_DAC(self, label , value = 1 ):
-		formatter = self.formatter;
-		dac_p     = self.ccd._default_bias_params[label];
-		code      = self.ccd._dac_bias_volt_to_code(value, dac_p['voltType']);
-		line      = formatter.configurator_spi_bias_clocks(dac_p['dev'], dac_p['pol'] , dac_p['nbits'], (dac_p['address']<<16) + code );
-		
-		print formatter.as_legacy_file([line])
-		print line
-		
-		successful_transfers = 0;		
-		
-		# if USB_MODE:
-		# 	with usbEasy.Device(vid = self._vid, pid = self._pid, context = self.context) as dev:
-		# 		port_write = dev.open_port(self._write_address);
-		# 		port_read  = dev.open_port(self._read_address);
-		# 		if VERBOSE:
-		# 			self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
-		# 		successful_transfers += port_write.write_sync(line);
-		# 		if VERBOSE:
-		# 			self.log.info( 'Sent [bytes]: ' + str(successful_transfers) )
-		# 		response = port_read.read_sync(1024)
-		# 		if VERBOSE:
-		# 			self.log.info( 'Received: ' + str(response) )
-		# 		if(response == _success_cache):
-		# 			self.log.info('Received SUCCESS !', 10);
-		# 		else:
-		# 			self.log.error('Received ERROR !: (len ' + str(len(response)) + ') ' + str(list(response[:4])), 1);
-		# else:
-		# 	self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
-	
+		self.set_dac_sweep(label, [value]);
 
+	## Sets a sequence of voltages on a single bias DAC.
+	#
+	# Every voltage is converted up front and the lines are sent back to back, in order, with
+	# all the transfers in flight together. The DAC ends at the last voltage.
+	#
+	# @warning Look at the Camera class warning
+	#
+	# @param self An instance of Camera
+	# @param label (str) Name of the bias DAC, a key of the ccd bias parameters (ex. 'BHV1A').
+	# @param values ([float...]) Voltages to set, in order.
+	def set_dac_sweep(self, label, values):
+		if(label not in self.ccd._default_bias_params):
+			raise ValueError('Bias DAC ' + str(label) + " doesn't exist !");
 
+		formatter = self.formatter;
+		dac_p     = self.ccd._default_bias_params[label];
+		volt_type = dac_p['voltType'];
+		header    = dac_p['address']<<16;
+		lines     = [formatter.configurator_spi_bias_clocks(dac_p['dev'], dac_p['pol'], dac_p['nbits'], \
+						header + self.ccd._dac_bias_volt_to_code(value, volt_type)) for value in values];
+		self._send_lines(formatter, lines);
 
 
 	## Configure the camera ccd for current self.ccd settings.
@@ -209,139 +289,408 @@ class Camera:
 	# @param self An instance of Camera.
 	def configure(self):
 		formatter = self.formatter;
-		self.ccd.compile_configured_program();
-		bytecode_lines = self.ccd.get_configuration_bytecode(formatter);
+		bytecode_lines = self._get_configuration_bytecode(formatter);
 		expose_line = formatter.write_exposition_time(self.shutter.expose_time_ms);
 		bytecode_lines.append(expose_line);
+		self._send_lines(formatter, bytecode_lines);
+
+	## Sends lines of bytecode to the camera and checks the response to each one.
+	#
+	# @warning Look at the Camera class warning.
+	#
+	# @param self An instance of Camera.
+	# @param formatter (binary.ByteCode) The formatter of the bytecode, used to log it.
+	# @param bytecode_lines ([str...]) The lines to send, in order.
+	def _send_lines(self, formatter, bytecode_lines):
 		successful_transfers = 0;
 
+		# Checked once, the messages below are skipped entirely when they would not be logged
+		verbose     = VERBOSE and self.log.enabled(4);
+		log_success = self.log.enabled(10);
+
 		if USB_MODE:
-			with usbEasy.Device(vid = self._vid, pid = self._pid, context = self.context) as dev:
-				port_write = dev.open_port(self._write_address);
-				port_read  = dev.open_port(self._read_address);
+			self._get_device();
+			port_write = self._port_write;
+			port_read  = self._port_read;
+			if verbose:
 				for line in bytecode_lines:
-					if VERBOSE:
-						self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
-					successful_transfers += port_write.write_sync(line);
-					if VERBOSE:
-						self.log.info( 'Sent [bytes]: ' + str(successful_transfers) )
-					response = port_read.read_sync(1024)
-					if VERBOSE:
-						self.log.info( 'Received: ' + str(response) )
-					if(response == _success_cache):
+					self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
+
+			# Arm a reader for every response, then send each line as its own transfer, all in
+			# flight together: the lines do not wait a round-trip for the previous response.
+			chunk = len(_success_cache);
+			response_reader = port_read.read_async(chunk, min(len(bytecode_lines), 8), chunk*len(bytecode_lines));
+			try:
+				successful_transfers += port_write.write_lines_async(bytecode_lines)();
+			except:
+				# Lines that were not sent will not be answered
+				response_reader.cancel();
+				raise;
+			if verbose:
+				self.log.info('Sent [bytes]: %d', 4, successful_transfers);
+			data = response_reader();
+
+			# Every line was submitted before reaping any response, so they are validated in
+			# bulk: a single comparison against the expected run of success responses. Responses
+			# are only split and checked one by one when something failed or must be logged.
+			if(not verbose and data == _success_cache*len(bytecode_lines)):
+				if log_success:
+					for ii in range(len(bytecode_lines)):
 						self.log.info('Received SUCCESS !', 10);
-					else:
-						self.log.error('Received ERROR !: (len ' + str(len(response)) + ') ' + str(list(response[:4])), 1);
-		else:
+				return;
+
+			responses = [bytes(data[ii:(ii+chunk)]) for ii in range(0, len(data), chunk)];
+			if(len(responses) != len(bytecode_lines)):
+				self.log.error('Received %d responses for %d instructions.', 1, len(responses), len(bytecode_lines));
+
+			for response in responses:
+				if verbose:
+					self.log.info('Received: %s', 4, response);
+				if(_is_success(response)):
+					if log_success:
+						self.log.info('Received SUCCESS !', 10);
+				else:
+					self.log.error('Received ERROR !: (len %d) %s', 1, len(response), log.Lazy(lambda: _format_response_head(response)));
+		elif self.log.enabled(4):
 			for line in bytecode_lines:
-				self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
+				self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
 
 
+	## Gets the ccd configuration bytecode, compiling the ccd program only if its settings changed.
+	#
+	# @param self An instance of Camera.
+	# @param formatter (binary.ByteCode) The formatter of the bytecode.
+	#
+	# @returns A list of bytecode ([str...])
+	def _get_configuration_bytecode(self, formatter):
+		# The objects themselves are part of the key (compared by identity), a new ccd with the same
+		# settings still needs its program compiled.
+		key = (self.ccd, formatter, formatter.endianess, self.ccd.get_settings_key());
+		if(self._configuration_cache is None or self._configuration_cache[0] != key):
+			self.ccd.compile_configured_program();
+			self._configuration_cache = (key, tuple(self.ccd.get_configuration_bytecode(formatter)));
+		return list(self._configuration_cache[1]);
+
+	## Gets the bytecodes needed to take a picture with the current settings.
+	#
+	# @param self An instance of Camera.
+	# @param formatter (binary.ByteCode) The formatter of the bytecode.
+	#
+	# @returns The write exposition time and get image bytecodes (str, str)
+	def _get_picture_bytecodes(self, formatter):
+		# Get image (get the mode name then transform it to the sequencer memory address)
+		program                    = self.ccd.get_configured_program();
+		stop_cleaning_mode_name    = self.ccd.get_stop_cleaning_mode_name();
+		stop_cleaning_mode_address = program.get_address(stop_cleaning_mode_name);
+		get_image_mode_name        = self.ccd.get_test_serial_clocks_mode_name();
+		#test: get_image_mode_name        = self.ccd.get_get_image_mode_name();
+		get_image_mode_address     = program.get_address(get_image_mode_name);
+
+		# The bytecodes are only generated again when something they depend on changed
+		key = (formatter, formatter.endianess, self.shutter.expose_time_ms, \
+				stop_cleaning_mode_address, get_image_mode_address, bool(self.shutter.open));
+		if(self._picture_bytecodes_cache is None or self._picture_bytecodes_cache[0] != key):
+			# Write exposition time
+			write_exposition_time_bytecode = formatter.write_exposition_time(self.shutter.expose_time_ms);
+			get_image_bytecode             = formatter.get_image(stop_cleaning_mode_address, get_image_mode_address, open_shutter=self.shutter.open);
+			self._picture_bytecodes_cache  = (key, (write_exposition_time_bytecode, get_image_bytecode));
+
+		return self._picture_bytecodes_cache[1];
+
+	## Sends the exposition time, its response is read asynchronously.
+	#
+	# The reads of the endpoint complete in submission order, so the image reader can be
+	# armed and the get image command sent without waiting a round-trip for this response.
+	#
+	# @param self An instance of Camera.
+	# @param dev (usb.Device) The camera device.
+	# @param line (str) The write exposition time bytecode.
+	#
+	# @returns A _TransferCollector, calling it returns the camera response.
+	def _send_exposition_time(self, dev, line):
+		port_read = dev.open_port(self._read_address, self.shutter.expose_time_ms + 500);
+		response_reader = port_read.read_async(1024, 1, 1024);
+		successful_transfer = self._port_write.write_sync(line);
+		return response_reader;
+
+	## Arms the image reader, then sends the get image command.
+	#
+	# read_async submits every transfer right away, so the host is ready to drain the camera
+	# from its first byte. The first transfers wait for the exposition, so it is included in
+	# the timeout.
+	#
+	# @param self An instance of Camera.
+	# @param dev (usb.Device) The camera device.
+	# @param line (str) The get image bytecode.
+	# @param image_size (int) Size of the image (in bytes).
+	# @param buffer (bytearray or numpy.ndarray) Writable buffer to receive the image into, None to allocate one.
+	#
+	# @returns A _TransferCollector, calling it returns the raw image data.
+	def _start_image_read(self, dev, line, image_size, buffer = None):
+		# Instance image reader (big transfers of whole packets, the last one gets the rest of the image;
+		# stops once the whole image is received)
+		port_read = dev.open_port(self._read_address, self.shutter.expose_time_ms + self._image_timeout_ms);
+		async_reader = port_read.read_async( \
+			port_read.round_to_packets(min(image_size, self._image_transfer_size)),
+			self._image_pararell_transfers,
+			image_size,
+			buffer );
+
+		# Send Get Image command (stop cleaning, start exposition, and retrieve the captured image)
+		# right after arming the reader.
+		successful_transfer = self._port_write.write_sync(line);
+
+		self.log.info('Exposing for %d ms . . .', 0, self.shutter.expose_time_ms);
+		return async_reader;
+
+	## Checks the response to the exposition time.
+	#
+	# @param self An instance of Camera.
+	# @param response_reader (usb._TransferCollector) The reader returned by _send_exposition_time.
+	def _check_exposition_time_response(self, response_reader):
+		response0 = response_reader();
+		if(not _is_success(response0)):
+			self.log.error('Could not set exposition time, response: (len %d) %s', 1, len(response0), log.Lazy(lambda: _format_response_head(response0)));
+
+	## Forms the image from the data received.
+	#
+	# @param self An instance of Camera.
+	# @param raw_data (bytearray) The received data, big endian 16 bits pixels.
+	# @param resolution ((int, int)) The image resolution.
+	# @param native (bool) Convert the image to native byte order (True) or return the big endian view (False).
+	#
+	# @returns A numpy array containing the image.
+	def _decode_image(self, raw_data, resolution, native = True):
+		# Format data received (big endian 16 bits pixels, viewed in place)
+		n_pixels = resolution[0]*resolution[1];
+		if len(raw_data) < 2*n_pixels:
+			raise RuntimeError( 'The amount of Received bytes (' + str(len(raw_data)) + ') ' + \
+								'is less than the needed to form an image (' + str(2*n_pixels) + ').');
+
+		image = np.frombuffer(raw_data, dtype='>u2', count=n_pixels).reshape(resolution);
+
+		# Convert to native byte order with a single pass over the image, in place when the buffer is writable
+		if(native and not image.dtype.isnative):
+			if(image.flags.writeable):
+				image = image.byteswap(True).view(image.dtype.newbyteorder('='));
+			else:
+				image = image.astype(np.uint16);
+		return image
+
 	## Takes a picture using the ccd's settings.
 	#
 	# @warning You must first call configure to ensure correct ccd operation.
 	# @warning Look at the Camera class warning
 	#
 	# @param self An instance of Camera.
+	# @param native (bool) If False, the image is returned as a big endian (dtype '>u2') view of
+	# the received data, skipping the byte order conversion. Enough to save or plot it.
+	# @param out (numpy.ndarray) Array to receive the image into, instead of allocating a new
+	# buffer per picture: C contiguous, writable and 2 bytes per pixel. The returned image is a
+	# view of its memory, so with a native uint16 array (native = True) or a '>u2' array
+	# (native = False) out itself holds the image. Ignored in debug mode.
 	#
 	# @returns A numpy array containing the image.
-	def take_picture(self):
-		formatter = binary.ByteCode();
+	def take_picture(self, native = True, out = None):
+		formatter = self.formatter;
 		
 		# Get command bytecodes for taking a picture
-		# Write exposition time
-		write_exposition_time_bytecode = formatter.write_exposition_time(self.shutter.expose_time_ms);
-
-		# Get image (get the mode name then transform it to the sequencer memory address)
-		stop_cleaning_mode_name    = self.ccd.get_stop_cleaning_mode_name();
-		stop_cleaning_mode_address = self.ccd.get_configured_program().get_address(stop_cleaning_mode_name);
-		get_image_mode_name        = self.ccd.get_test_serial_clocks_mode_name();
-		#test: get_image_mode_name        = self.ccd.get_get_image_mode_name();
-		get_image_mode_address     = self.ccd.get_configured_program().get_address(get_image_mode_name);
-		get_image_bytecode         = formatter.get_image(stop_cleaning_mode_address, get_image_mode_address, open_shutter=self.shutter.open);
+		write_exposition_time_bytecode, get_image_bytecode = self._get_picture_bytecodes(formatter);
 
 		# Take the picture
 		raw_data   = None;
 		resolution = self.ccd.get_image_resolution();
+		verbose    = self.log.enabled(4);
 
 		# USB Mode
 		if USB_MODE:
-			with usbEasy.Device(vid = self._vid, pid = self._pid, context = self.context) as dev:
-				port_write = dev.open_port(self._write_address);
-				port_read  = dev.open_port(self._read_address, self.shutter.expose_time_ms + 500);
-
-				# Set exposition time
-				line = write_exposition_time_bytecode
-				self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
-				successful_transfer = port_write.write_sync(line);
-				response0 = port_read.read_sync(1024);
-				##if (response0 != _success_cache):
-				##	self.log.error( 'Could not set exposition time, response: ' + str(response0) );
-				##	return np.array([]);
-
-				# Instance image reader
-				port_read = dev.open_port(self._read_address, 100);
-				async_reader = port_read.read_async(1024);
-
-				# Send Get Image command (stop cleaning, start exposition, and retrieve the captured image)
-				line = get_image_bytecode
-				self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
-				successful_transfer = port_write.write_sync(line);
-
-				self.log.info( 'Exposing for ' + str(self.shutter.expose_time_ms) + ' ms . . .' )
-
-				# Receive image
-				raw_data = async_reader();
+			# The image is received straight into out's memory
+			image_size = 2*resolution[0]*resolution[1];
+			buffer     = None;
+			if(out is not None):
+				if(out.nbytes != image_size or out.itemsize != 2 or not out.flags.c_contiguous or not out.flags.writeable):
+					raise ValueError('out must be a writable C contiguous array of ' + str(resolution[0]*resolution[1]) + ' 2 bytes pixels.');
+				buffer = out.reshape(-1).view(np.uint8);
+
+			dev = self._get_device();
 
-				# End with (USB communication)
+			# Set exposition time
+			line = write_exposition_time_bytecode
+			if verbose:
+				self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
+			response_reader = self._send_exposition_time(dev, line);
+
+			# Get image
+			line = get_image_bytecode
+			if verbose:
+				self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
+			async_reader = self._start_image_read(dev, line, image_size, buffer);
 
-			# Format data received
-			fmt = '>' + 'H'*(resolution[0]*resolution[1]);
-			if len(raw_data) < struct.calcsize(fmt):
-				raise RuntimeError( 'The amount of Received bytes (' + str(len(raw_data)) + ') ' + \
-									'is less than the needed to form an image (' + str(struct.calcsize(fmt)) + ').');
+			self._check_exposition_time_response(response_reader);
 
-			unpacked_data = struct.unpack(fmt, raw_data[:(2*resolution[0]*resolution[1])]);
-			image = np.array(unpacked_data).reshape(resolution);
-			return image
+			# Receive image
+			raw_data = async_reader();
+			return self._decode_image(raw_data, resolution, native);
 
 		# Debug Mode
 		else:
 			# Set exposition time
 			line = write_exposition_time_bytecode
-			self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
+			if verbose:
+				self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
 
 			# Get image
 			line = get_image_bytecode
-			self.log.info( 'Sending: (len ' + str(len(line)) + ') '+ formatter.as_legacy_file([line]) );
+			if verbose:
+				self.log.info('Sending: (len %d) %s', 4, len(line), log.Lazy(lambda: formatter.as_legacy_line(line)));
 
 			# Simulate exposition time
-			self.log.info( 'Exposing for ' + str(self.shutter.expose_time_ms) + ' ms . . .' )
+			self.log.info('Exposing for %d ms . . .', 0, self.shutter.expose_time_ms);
 			time.sleep( self.shutter.expose_time_ms / 1000.0 )
 
-			# Generate a random image
-			image = np.zeros( resolution )
-			for i in range(resolution[0]):
-				for j in range(resolution[1]):
-					if i < resolution[0]/2:
-						if j > resolution[1]/2:
-							image[i,j] = (i+j)%256
-						else:
-							image[i,j] = (-i+j)%256
-					else:
-						if j > resolution[1]/2:
-							image[i,j] = (i-j)%256
-						else:
-							image[i,j] = (-i-j)%256
-				#image[i,:] = i%256
-			
+			# Generate a test pattern, each quadrant with its own diagonal gradient
+			i = np.arange(resolution[0])[:, None];
+			j = np.arange(resolution[1])[None, :];
+			right = j > resolution[1]//2;
+			top    = np.where(right, (i+j)%256, (-i+j)%256);
+			bottom = np.where(right, (i-j)%256, (-i-j)%256);
+			image = np.where(i < resolution[0]//2, top, bottom).astype(np.float64);
+
 			return image;
 
+	## Takes several pictures in a row, overlapping each readout with the processing of the previous image.
+	#
+	# The exposition time is sent once. As soon as an image is received, the reader for the
+	# next one is armed and its get image command sent, before the image is handed out. So the
+	# next exposition and readout run while the caller processes the current image.
+	#
+	# @warning You must first call configure to ensure correct ccd operation.
+	# @warning Look at the Camera class warning, the camera can not be used until the generator is exhausted
+	# or closed. Closing it early cancels the pending image read.
+	#
+	# @param self An instance of Camera.
+	# @param n_pictures (int) Number of pictures to take.
+	# @param native (bool) Convert the images to native byte order. See take_picture.
+	#
+	# @returns A generator of numpy arrays containing the images.
+	def take_picture_stream(self, n_pictures, native = True):
+		if not USB_MODE:
+			for ii in range(n_pictures):
+				yield self.take_picture(native);
+			return;
+
+		if(n_pictures <= 0):
+			return;
+
+		formatter = self.formatter;
+		write_exposition_time_bytecode, get_image_bytecode = self._get_picture_bytecodes(formatter);
+		resolution = self.ccd.get_image_resolution();
+		image_size = 2*resolution[0]*resolution[1];
+
+		dev = self._get_device();
+		response_reader = self._send_exposition_time(dev, write_exposition_time_bytecode);
+		async_reader = self._start_image_read(dev, get_image_bytecode, image_size);
+		try:
+			self._check_exposition_time_response(response_reader);
+
+			for ii in range(n_pictures):
+				raw_data = async_reader();
+				async_reader = None;
+				if(ii + 1 < n_pictures):
+					async_reader = self._start_image_read(dev, get_image_bytecode, image_size);
+				yield self._decode_image(raw_data, resolution, native);
+		finally:
+			# Stopped early (break, close or an error), do not leave image transfers in flight on the read port.
+			if(async_reader is not None):
+				async_reader.cancel();
+
+	## Takes pictures continuously on a separate process.
+	#
+	# The child process opens its own camera and writes each image into a ring of shared
+	# memory buffers, so reading out frame N+1 overlaps with the processing of frame N and
+	# does not compete with this process for the GIL. Only the buffer index travels through
+	# the queues. Stopping the iteration early stops the child after its current picture, and a
+	# child that dies without finishing raises RuntimeError.
+	#
+	# The child logs to a new log context with the verbosity of this camera's log: log contexts
+	# (and their output functions) are not sent to it, they can not be pickled on python 2.
+	#
+	# @note On POSIX the child is forked, and it creates its own libusb context while the parent's
+	# is still open. This camera releases its device before, and the child never uses the inherited
+	# context. On Windows the child is spawned instead, so the ccd and shutter must be picklable.
+	#
+	# @warning You must first call configure to ensure correct ccd operation.
+	# @warning Look at the Camera class warning, the camera can not be used while streaming.
+	#
+	# @param self An instance of Camera.
+	# @param n_frames (int) Number of pictures to take.
+	# @param ring_size (int) Number of shared image buffers.
+	#
+	# @returns A generator of numpy arrays containing the images. Each array is a view of a
+	# shared buffer, valid only until the next image is requested (copy it to keep it).
+	def stream_pictures(self, n_frames, ring_size = 2):
+		resolution = self.ccd.get_image_resolution();
+		n_pixels   = resolution[0]*resolution[1];
+		ring       = [multiprocessing.RawArray('H', n_pixels) for ii in range(ring_size)];
+		free       = multiprocessing.Queue();
+		ready      = multiprocessing.Queue();
+		for ii in range(ring_size):
+			free.put(ii);
+
+		# The child claims the camera on its own
+		if USB_MODE:
+			self._release_device();
+
+		worker = multiprocessing.Process( \
+			target = _stream_pictures_worker,
+			args   = (self.ccd, self.shutter, self.log.get_verbosity(), ring, free, ready, n_frames) );
+		worker.daemon = True;
+		worker.start();
+
+		finished = False;
+		try:
+			while(True):
+				# Wait in steps, to notice a child that died without saying it was done.
+				try:
+					index = ready.get(True, 0.5);
+				except queue.Empty:
+					if(worker.is_alive()):
+						continue;
+					try:
+						index = ready.get(False);
+					except queue.Empty:
+						raise RuntimeError('The streaming process ended unexpectedly (exit code ' + str(worker.exitcode) + ').');
+				if(index is None):
+					finished = True;
+					break;
+				yield np.frombuffer(ring[index], dtype=np.uint16).reshape(resolution);
+				free.put(index);
+		finally:
+			if(not finished):
+				# Stopped early (break, close or an error), tell the child to stop after its current picture.
+				free.put(None);
+				worker.join((self.shutter.expose_time_ms + self._image_timeout_ms) / 1000.0 + 5);
+				if(worker.is_alive()):
+					worker.terminate();
+			worker.join();
+
 
 	## @var context
 	# The camera libusb1 context. For internal use only.
+	## @var _device
+	# The opened USB device (usb.Device) of the camera, or None. For internal use only.
+	## @var _device_lost
+	# (bool) True if the camera was unplugged while _device was opened. For internal use only.
+	## @var _port_write
+	# The port (usb.Port) to write into the camera, or None. For internal use only.
+	## @var _port_read
+	# The port (usb.Port) to read from the camera, or None. For internal use only.
 	## @var log
 	# The camera logging context. For internal use only.
+	## @var _configuration_cache
+	# The settings key and bytecode of the last configuration, or None. For internal use only.
+	## @var _picture_bytecodes_cache
+	# The settings key and bytecodes of the last picture, or None. For internal use only.
 	## @var ccd
 	# The camera _CCD object, interact with it to configure image's parameters.
 	# @see _CCD
@@ -351,3 +700,35 @@ class Camera:
 	## @var on_disconnect_fn
 	# The function to call when the camera is unplugged. For internal use only.
 	# @see set_camera_on_connect_function.
+
+
+
+## Body of the process started by Camera.stream_pictures.
+# @note For internal use only.
+#
+# @param ccd_settings The _CCD of the streaming camera, with its program compiled.
+# @param shutter_settings The shutter.Shutter of the streaming camera.
+# @param verbosity (int) The log verbosity of the streaming camera.
+# @param ring ([multiprocessing.RawArray...]) The shared image buffers.
+# @param free (multiprocessing.Queue) Indexes of the buffers that can be written, None to stop.
+# @param ready (multiprocessing.Queue) Indexes of the buffers holding a new image, None when done.
+# @param n_frames (int) Number of pictures to take.
+def _stream_pictures_worker(ccd_settings, shutter_settings, verbosity, ring, free, ready, n_frames):
+	resolution  = ccd_settings.get_image_resolution();
+	log_context = log.new_context();
+	log_context.set_verbosity(verbosity);
+	try:
+		with Camera(ccd = ccd_settings, shutter = shutter_settings, log = log_context) as camera:
+			for ii in range(n_frames):
+				index = free.get();
+				if(index is None):
+					break;
+
+				# The picture is received straight into the shared buffer
+				frame = np.frombuffer(ring[index], dtype=np.uint16).reshape(resolution);
+				image = camera.take_picture(out = frame);
+				if(not np.may_share_memory(image, frame)):
+					frame[...] = image;
+				ready.put(index);
+	finally:
+		ready.put(None);
@@ -9,13 +9,25 @@
 # This module contains the _CCD class with specifies an overridable interface for
 # CCD program generation.
 
-import six as six;
 from math import ceil, floor;
 from collections import namedtuple as namedtuple;
 
 import sequencer as sequencer;
 
 
+## Puts a table of pin values written by pin name in a given pin order.
+# @note For internal use only.
+#
+# @param names (tuple(str)) The pin order of the rows.
+# @param named_bits ({str:tuple(int)...}) The values of each pin name, every pin of names must be there.
+#
+# @returns A tuple with the values of each pin, one row per name (as sequencer.State.from_bits_array takes them).
+def _pin_rows(names, named_bits):
+	if(set(names) != set(named_bits.keys())):
+		raise ValueError('Pin names of the table (' + ', '.join(sorted(named_bits.keys())) + ') do not match the pin order (' + ', '.join(names) + ').');
+	return tuple([named_bits[k] for k in names]);
+
+
 ## Defines a CCD minimal function definitions.
 # @note This is an abstract class it MUST be overriden in order to work.
 #
@@ -60,6 +72,17 @@ class _CCD:
 	def get_metadata(self):
 		return list(self._metadata);
 
+	## Gets a key describing the current value of every attribute set on the init method.
+	#
+	# Two calls return equal keys only if no attribute changed in between, use it to
+	# reuse compiled programs and bytecode.
+	#
+	# @param self An instance of _CCD
+	#
+	# @returns A str representation of the attribute values.
+	def get_settings_key(self):
+		return repr([(k, getattr(self, k)) for k in self._metadata]);
+
 	## Checks that the CCD parameters are valid for programming.
 	#
 	# If an attribute is not valid, a ValueError shall be raised.
@@ -141,9 +164,7 @@ class _CCD:
 			bytecode_lines.append(formatter.configurator_spi_bias_clocks(word.dev, word.pol, word.nbits, (word.address<<16) + word.voltage));
 
 		# Initialize Sequencer
-		for ii in range(len(self.configured_program.codes)):
-			seq_line = self.configured_program.codes[ii];
-			bytecode_lines.append(formatter.write_sequencer_memory(ii, seq_line));
+		bytecode_lines.extend(formatter.write_sequencer_program(self.configured_program.codes));
 
 		bytecode_lines.append(formatter.enable_sequencer());
 
@@ -418,6 +439,354 @@ class CCD_230_42(_CCD):
 		'CH4'  : {'voltage':  +0.342},
 	}
 
+	## Pin order of the rows of the mode state tables below. The tables are written by pin name and
+	# put in this order once (see _pin_rows), so reordering _default_clock_order can not miswire them.
+	_mode_bits_pins = tuple(_default_clock_order);
+
+	## Pin values of each cleaning_repeat state, by pin name
+	_cleaning_repeat_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,1,1,1,0,),
+		'PC2D' : (0,0,0,0,1,1,1,),
+		'PC3D' : (1,1,0,0,0,0,0,),
+		'PC4D' : (0,1,1,1,1,0,0,),
+		'PC1U' : (0,0,0,1,1,1,0,),
+		'PC2U' : (0,0,0,0,1,1,1,),
+		'PC3U' : (1,1,0,0,0,0,0,),
+		'PC4U' : (0,1,1,1,1,0,0,),
+		'SC1L' : (1,1,1,1,1,1,1,),
+		'SC2L' : (1,1,1,1,1,1,1,),
+		'SC1R' : (1,1,1,1,1,1,1,),
+		'SC2R' : (1,1,1,1,1,1,1,),
+		'SCO'  : (0,0,0,0,0,0,0,),
+		'TGD'  : (0,0,0,1,1,1,0,),   # 4 Outputs > equal to PC1
+		'TGU'  : (0,0,0,1,1,1,0,),   # 4 Outputs > equal to PC1
+		'ORL'  : (1,1,1,1,1,1,1,),
+		'ORR'  : (1,1,1,1,1,1,1,),
+		'SWOL' : (0,0,0,0,0,0,0,),
+		'SWOR' : (0,0,0,0,0,0,0,),
+		'DGD'  : (1,1,1,1,1,1,1,),
+		'DGU'  : (1,1,1,1,1,1,1,),
+		'PIXT' : (0,0,0,0,0,0,0,),
+		'CRST' : (1,1,1,1,1,1,1,),
+	});
+
+	## Pin values of each cleaning_end state, by pin name
+	_cleaning_end_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,0,),
+		'PC2D' : (0,0,0,0,),
+		'PC3D' : (0,0,0,0,),
+		'PC4D' : (0,0,0,0,),
+		'PC1U' : (0,0,0,0,),
+		'PC2U' : (0,0,0,0,),
+		'PC3U' : (0,0,0,0,),
+		'PC4U' : (0,0,0,0,),
+		'SC1L' : (1,0,0,1,),
+		'SC2L' : (1,0,0,1,),
+		'SC1R' : (1,0,0,1,),
+		'SC2R' : (1,0,0,1,),
+		'SCO'  : (0,0,0,0,),
+		'TGD'  : (0,0,0,0,),
+		'TGU'  : (0,0,0,0,),
+		'ORL'  : (1,1,1,1,),
+		'ORR'  : (1,1,1,1,),
+		'SWOL' : (0,0,0,0,),
+		'SWOR' : (0,0,0,0,),
+		'DGD'  : (1,1,0,0,),
+		'DGU'  : (1,1,0,0,),
+		'PIXT' : (0,0,0,0,),
+		'CRST' : (1,1,1,1,),
+	});
+
+	## Pin values of each exposing state, by pin name
+	_exposing_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,),
+		'PC2D' : (0,),
+		'PC3D' : (0,),
+		'PC4D' : (0,),
+		'PC1U' : (0,),
+		'PC2U' : (0,),
+		'PC3U' : (0,),
+		'PC4U' : (0,),
+		'SC1L' : (1,),
+		'SC2L' : (1,),
+		'SC1R' : (1,),
+		'SC2R' : (1,),
+		'SCO'  : (0,),
+		'TGD'  : (0,),
+		'TGU'  : (0,),
+		'ORL'  : (1,),
+		'ORR'  : (1,),
+		'SWOL' : (0,),
+		'SWOR' : (0,),
+		'DGD'  : (0,),
+		'DGU'  : (0,),
+		# 'PIXT' : (0,),
+		'PIXT' : (0,),
+		'CRST' : (1,),
+	});
+
+	## Pin values of each init_sweep_out state, by pin name
+	_init_sweep_out_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,0,0,0,0,),
+		'PC2D' : (0,0,0,0,0,0,0,),
+		'PC3D' : (0,0,0,0,0,0,0,),
+		'PC4D' : (0,0,0,0,0,0,0,),
+		'PC1U' : (0,0,0,0,0,0,0,),
+		'PC2U' : (0,0,0,0,0,0,0,),
+		'PC3U' : (0,0,0,0,0,0,0,),
+		'PC4U' : (0,0,0,0,0,0,0,),
+		'SC1L' : (0,0,0,0,1,1,1,),
+		'SC2L' : (1,1,1,0,0,0,1,),
+		'SC1R' : (0,0,0,0,1,1,1,),
+		'SC2R' : (1,1,1,0,0,0,1,),
+		'SCO'  : (0,0,1,1,1,0,0,),
+		'TGD'  : (0,0,0,0,0,0,0,),
+		'TGU'  : (0,0,0,0,0,0,0,),
+		'ORL'  : (1,0,0,0,0,0,0,),
+		'ORR'  : (1,0,0,0,0,0,0,),
+		'SWOL' : (0,0,1,1,1,0,0,),
+		'SWOR' : (0,0,1,1,1,0,0,),
+		'DGD'  : (0,0,0,0,0,0,0,),
+		'DGU'  : (0,0,0,0,0,0,0,),
+		# 'PIXT' : (0,0,0,0,0,0,0,),
+		'PIXT' : (1,1,1,1,1,1,1,),
+		'CRST' : (0,0,0,0,0,0,0,),
+	});
+
+	## Pin values of each sweep_out state, by pin name
+	_sweep_out_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,0,0,0,0,0,),
+		'PC2D' : (0,0,0,0,0,0,0,0,),
+		'PC3D' : (0,0,0,0,0,0,0,0,),
+		'PC4D' : (0,0,0,0,0,0,0,0,),
+		'PC1U' : (0,0,0,0,0,0,0,0,),
+		'PC2U' : (0,0,0,0,0,0,0,0,),
+		'PC3U' : (0,0,0,0,0,0,0,0,),
+		'PC4U' : (0,0,0,0,0,0,0,0,),
+		'SC1L' : (0,0,0,0,0,1,1,1,),
+		'SC2L' : (1,1,1,1,0,0,0,1,),
+		'SC1R' : (0,0,0,0,0,1,1,1,),
+		'SC2R' : (1,1,1,1,0,0,0,1,),
+		'SCO'  : (0,0,0,1,1,1,0,0,),
+		'TGD'  : (0,0,0,0,0,0,0,0,),
+		'TGU'  : (0,0,0,0,0,0,0,0,),
+		'ORL'  : (0,1,0,0,0,0,0,0,),
+		'ORR'  : (0,1,0,0,0,0,0,0,),
+		'SWOL' : (0,0,0,1,1,1,0,0,),
+		'SWOR' : (0,0,0,1,1,1,0,0,),
+		'DGD'  : (0,0,0,0,0,0,0,0,),
+		'DGU'  : (0,0,0,0,0,0,0,0,),
+		# 'PIXT' : (0,0,0,0,0,0,0,0,),
+		'PIXT' : (1,1,1,1,1,1,1,1,),
+		'CRST' : (0,0,0,0,0,0,0,0,),
+	});
+
+	## Pin values of each end_sweep_out state, by pin name
+	_end_sweep_out_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,),
+		'PC2D' : (0,0,),
+		'PC3D' : (0,0,),
+		'PC4D' : (0,0,),
+		'PC1U' : (0,0,),
+		'PC2U' : (0,0,),
+		'PC3U' : (0,0,),
+		'PC4U' : (0,0,),
+		'SC1L' : (1,1,),
+		'SC2L' : (1,1,),
+		'SC1R' : (1,1,),
+		'SC2R' : (1,1,),
+		'SCO'  : (0,0,),
+		'TGD'  : (0,0,),
+		'TGU'  : (0,0,),
+		'ORL'  : (0,1,),
+		'ORR'  : (0,1,),
+		'SWOL' : (0,0,),
+		'SWOR' : (0,0,),
+		'DGD'  : (0,0,),
+		'DGU'  : (0,0,),
+		# 'PIXT' : (0,0,),
+		'PIXT' : (1,0,),
+		'CRST' : (0,1,),
+	});
+
+	## Pin values of each parallel state, by pin name
+	_parallel_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,1,1,1,0,0,),
+		'PC2D' : (0,0,0,0,1,1,1,0,),
+		'PC3D' : (1,1,0,0,0,0,0,0,),
+		'PC4D' : (0,1,1,1,1,0,0,0,),
+		'PC1U' : (0,0,0,1,1,1,0,0,),
+		'PC2U' : (0,0,0,0,1,1,1,0,),
+		'PC3U' : (1,1,0,0,0,0,0,0,),
+		'PC4U' : (0,1,1,1,1,0,0,0,),
+		'SC1L' : (1,1,1,1,1,1,1,1,),
+		'SC2L' : (1,1,1,1,1,1,1,1,),
+		'SC1R' : (1,1,1,1,1,1,1,1,),
+		'SC2R' : (1,1,1,1,1,1,1,1,),
+		'SCO'  : (0,0,0,0,0,0,0,0,),
+		'TGD'  : (0,0,0,1,1,1,0,0,),
+		'TGU'  : (0,0,0,1,1,1,0,0,),
+		'ORL'  : (1,1,1,1,1,1,1,1,),
+		'ORR'  : (1,1,1,1,1,1,1,1,),
+		'SWOL' : (0,0,0,0,0,0,0,0,),
+		'SWOR' : (0,0,0,0,0,0,0,0,),
+		'DGD'  : (0,0,0,0,0,0,0,0,),
+		'DGU'  : (0,0,0,0,0,0,0,0,),
+		# 'PIXT' : (0,0,0,0,0,0,0,0,),
+		'PIXT' : (0,0,0,0,0,0,0,0,),
+		'CRST' : (1,1,1,1,1,1,1,1,),
+	});
+
+	## Pin values of each init_binning state, by pin name
+	_init_binning_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,0,),
+		'PC2D' : (0,0,0,0,),
+		'PC3D' : (0,0,0,0,),
+		'PC4D' : (0,0,0,0,),
+		'PC1U' : (0,0,0,0,),
+		'PC2U' : (0,0,0,0,),
+		'PC3U' : (0,0,0,0,),
+		'PC4U' : (0,0,0,0,),
+		'SC1L' : (0,0,0,0,),
+		'SC2L' : (1,1,1,0,),
+		'SC1R' : (0,0,0,0,),
+		'SC2R' : (1,1,1,0,),
+		'SCO'  : (0,0,1,1,),
+		'TGD'  : (0,0,0,0,),
+		'TGU'  : (0,0,0,0,),
+		'ORL'  : (1,0,0,0,),
+		'ORR'  : (1,0,0,0,),
+		'SWOL' : (0,0,1,1,),
+		'SWOR' : (0,0,1,1,),
+		'DGD'  : (0,0,0,0,),
+		'DGU'  : (0,0,0,0,),
+		# 'PIXT' : (0,0,0,0,),
+		'PIXT' : (1,1,1,1,),
+		'CRST' : (1,0,0,0,),
+	});
+
+	## Pin values of each binning_repeat state, by pin name
+	_binning_repeat_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,0,0,0,0,0,0,),
+		'PC2D' : (0,0,0,0,0,0,0,0,0,),
+		'PC3D' : (0,0,0,0,0,0,0,0,0,),
+		'PC4D' : (0,0,0,0,0,0,0,0,0,),
+		'PC1U' : (0,0,0,0,0,0,0,0,0,),
+		'PC2U' : (0,0,0,0,0,0,0,0,0,),
+		'PC3U' : (0,0,0,0,0,0,0,0,0,),
+		'PC4U' : (0,0,0,0,0,0,0,0,0,),
+		'SC1L' : (0,1,1,1,0,0,0,0,0,),
+		'SC2L' : (0,0,0,1,1,1,1,1,0,),
+		'SC1R' : (0,1,1,1,0,0,0,0,0,),
+		'SC2R' : (0,0,0,1,1,1,1,1,0,),
+		'SCO'  : (1,1,0,0,0,0,0,1,1,),
+		'TGD'  : (0,0,0,0,0,0,0,0,0,),
+		'TGU'  : (0,0,0,0,0,0,0,0,0,),
+		'ORL'  : (0,0,0,0,0,1,0,0,0,),
+		'ORR'  : (0,0,0,0,0,1,0,0,0,),
+		'SWOL' : (1,1,1,1,1,1,1,1,1,),
+		'SWOR' : (1,1,1,1,1,1,1,1,1,),
+		'DGD'  : (0,0,0,0,0,0,0,0,0,),
+		'DGU'  : (0,0,0,0,0,0,0,0,0,),
+		'PIXT' : (1,1,1,1,1,1,1,1,1,),
+		'CRST' : (0,0,0,0,0,0,0,0,0,),
+	});
+
+	## Pin values of each binning_sample state, by pin name
+	_binning_sample_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,0,0,0,0,0,0,),
+		'PC2D' : (0,0,0,0,0,0,0,0,0,),
+		'PC3D' : (0,0,0,0,0,0,0,0,0,),
+		'PC4D' : (0,0,0,0,0,0,0,0,0,),
+		'PC1U' : (0,0,0,0,0,0,0,0,0,),
+		'PC2U' : (0,0,0,0,0,0,0,0,0,),
+		'PC3U' : (0,0,0,0,0,0,0,0,0,),
+		'PC4U' : (0,0,0,0,0,0,0,0,0,),
+		'SC1L' : (0,1,1,1,0,0,0,0,0,),
+		'SC2L' : (0,0,0,1,1,1,1,1,0,),
+		'SC1R' : (0,1,1,1,0,0,0,0,0,),
+		'SC2R' : (0,0,0,1,1,1,1,1,0,),
+		'SCO'  : (1,1,0,0,0,0,0,1,1,),
+		'TGD'  : (0,0,0,0,0,0,0,0,0,),
+		'TGU'  : (0,0,0,0,0,0,0,0,0,),
+		'ORL'  : (0,0,0,0,0,1,0,0,0,),
+		'ORR'  : (0,0,0,0,0,1,0,0,0,),
+		'SWOL' : (1,1,0,0,0,0,0,1,1,),
+		'SWOR' : (1,1,0,0,0,0,0,1,1,),
+		'DGD'  : (0,0,0,0,0,0,0,0,0,),
+		'DGU'  : (0,0,0,0,0,0,0,0,0,),
+		# 'PIXT' : (1,1,1,1,1,1,1,0,0,),
+		'PIXT' : (1,1,1,1,1,1,1,1,1,),
+		'CRST' : (0,0,0,0,0,1,0,0,0,),
+	});
+
+	## Pin values of each end_binning state, by pin name
+	_end_binning_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,0,0,0,0,0,0,),
+		'PC2D' : (0,0,0,0,0,0,0,),
+		'PC3D' : (0,0,0,0,0,0,0,),
+		'PC4D' : (0,0,0,0,0,0,0,),
+		'PC1U' : (0,0,0,0,0,0,0,),
+		'PC2U' : (0,0,0,0,0,0,0,),
+		'PC3U' : (0,0,0,0,0,0,0,),
+		'PC4U' : (0,0,0,0,0,0,0,),
+		'SC1L' : (0,1,1,1,1,1,1,),
+		'SC2L' : (0,0,0,1,1,1,1,),
+		'SC1R' : (0,1,1,1,1,1,1,),
+		'SC2R' : (0,0,0,1,1,1,1,),
+		'SCO'  : (1,1,0,0,0,0,0,),
+		'TGD'  : (0,0,0,0,0,0,0,),
+		'TGU'  : (0,0,0,0,0,0,0,),
+		'ORL'  : (0,0,0,0,0,1,1,),
+		'ORR'  : (0,0,0,0,0,1,1,),
+		'SWOL' : (1,1,0,0,0,0,0,),
+		'SWOR' : (1,1,0,0,0,0,0,),
+		'DGD'  : (0,0,0,0,0,0,0,),
+		'DGU'  : (0,0,0,0,0,0,0,),
+		# 'PIXT' : (1,1,1,1,1,1,0,),
+		'PIXT' : (1,1,1,1,1,1,0,),
+		'CRST' : (0,0,0,0,0,1,1,),
+	});
+
+	## Pin values of each cleaning_init state, by pin name
+	_cleaning_init_bits = _pin_rows(_mode_bits_pins, \
+	{ \
+		'PC1D' : (0,),
+		'PC2D' : (0,),
+		'PC3D' : (0,),
+		'PC4D' : (0,),
+		'PC1U' : (0,),
+		'PC2U' : (0,),
+		'PC3U' : (0,),
+		'PC4U' : (0,),
+		'SC1L' : (1,),
+		'SC2L' : (1,),
+		'SC1R' : (1,),
+		'SC2R' : (1,),
+		'SCO'  : (0,),
+		'TGD'  : (0,),
+		'TGU'  : (0,),
+		'ORL'  : (1,),
+		'ORR'  : (1,),
+		'SWOL' : (0,),
+		'SWOR' : (0,),
+		'DGD'  : (1,),
+		'DGU'  : (1,),
+		'PIXT' : (0,),
+		'CRST' : (1,),
+	});
+
 	## Default value for n_cols
 	_default_n_cols = 2048;
 	## Default value for n_rows
@@ -648,34 +1017,11 @@ class CCD_230_42(_CCD):
 		#        parallel, init_binning, binning, end_binning, cleaning_init
 
 		# CLEANING REPEAT
-		cleaning_repeat_states = sequencer.State.from_labels_array \
+		cleaning_repeat_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,1,1,1,0,),
-				'PC2D' : (0,0,0,0,1,1,1,),
-				'PC3D' : (1,1,0,0,0,0,0,),
-				'PC4D' : (0,1,1,1,1,0,0,),
-				'PC1U' : (0,0,0,1,1,1,0,),
-				'PC2U' : (0,0,0,0,1,1,1,),
-				'PC3U' : (1,1,0,0,0,0,0,),
-				'PC4U' : (0,1,1,1,1,0,0,),
-				'SC1L' : (1,1,1,1,1,1,1,),
-				'SC2L' : (1,1,1,1,1,1,1,),
-				'SC1R' : (1,1,1,1,1,1,1,),
-				'SC2R' : (1,1,1,1,1,1,1,),
-				'SCO'  : (0,0,0,0,0,0,0,),
-				'TGD'  : (0,0,0,1,1,1,0,),   # 4 Outputs > equal to PC1
-				'TGU'  : (0,0,0,1,1,1,0,),   # 4 Outputs > equal to PC1
-				'ORL'  : (1,1,1,1,1,1,1,),
-				'ORR'  : (1,1,1,1,1,1,1,),
-				'SWOL' : (0,0,0,0,0,0,0,),
-				'SWOR' : (0,0,0,0,0,0,0,),
-				'DGD'  : (1,1,1,1,1,1,1,),
-				'DGU'  : (1,1,1,1,1,1,1,),
-				'PIXT' : (0,0,0,0,0,0,0,),
-				'CRST' : (1,1,1,1,1,1,1,),
-			},
+			self._mode_bits_pins,
+			self._cleaning_repeat_bits,
 			(1500, 1500, 1500, 1500, 1500, 1500, 1500,)\
 		);
 		cleaning_repeat_mode = sequencer.Mode(name='cleaning_repeat', n_loops=0, next_mode_name='cleaning_end');
@@ -684,34 +1030,11 @@ class CCD_230_42(_CCD):
 
 
 		# CLEANING END
-		cleaning_end_states = sequencer.State.from_labels_array \
+		cleaning_end_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,0,),
-				'PC2D' : (0,0,0,0,),
-				'PC3D' : (0,0,0,0,),
-				'PC4D' : (0,0,0,0,),
-				'PC1U' : (0,0,0,0,),
-				'PC2U' : (0,0,0,0,),
-				'PC3U' : (0,0,0,0,),
-				'PC4U' : (0,0,0,0,),
-				'SC1L' : (1,0,0,1,),
-				'SC2L' : (1,0,0,1,),
-				'SC1R' : (1,0,0,1,),
-				'SC2R' : (1,0,0,1,),
-				'SCO'  : (0,0,0,0,),
-				'TGD'  : (0,0,0,0,),
-				'TGU'  : (0,0,0,0,),
-				'ORL'  : (1,1,1,1,),
-				'ORR'  : (1,1,1,1,),
-				'SWOL' : (0,0,0,0,),
-				'SWOR' : (0,0,0,0,),
-				'DGD'  : (1,1,0,0,),
-				'DGU'  : (1,1,0,0,),
-				'PIXT' : (0,0,0,0,),
-				'CRST' : (1,1,1,1,),
-			},
+			self._mode_bits_pins,
+			self._cleaning_end_bits,
 			(1500, 2000, 2000, 1500,)\
 		);
 		cleaning_end_mode = sequencer.Mode(name='cleaning_end', n_loops=1, next_mode_name='exposing');
@@ -720,35 +1043,11 @@ class CCD_230_42(_CCD):
 
 
 		# EXPOSING
-		exposing_states = sequencer.State.from_labels_array \
+		exposing_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,),
-				'PC2D' : (0,),
-				'PC3D' : (0,),
-				'PC4D' : (0,),
-				'PC1U' : (0,),
-				'PC2U' : (0,),
-				'PC3U' : (0,),
-				'PC4U' : (0,),
-				'SC1L' : (1,),
-				'SC2L' : (1,),
-				'SC1R' : (1,),
-				'SC2R' : (1,),
-				'SCO'  : (0,),
-				'TGD'  : (0,),
-				'TGU'  : (0,),
-				'ORL'  : (1,),
-				'ORR'  : (1,),
-				'SWOL' : (0,),
-				'SWOR' : (0,),
-				'DGD'  : (0,),
-				'DGU'  : (0,),
-				# 'PIXT' : (0,),
-				'PIXT' : (0,),
-				'CRST' : (1,),
-			},
+			self._mode_bits_pins,
+			self._exposing_bits,
 			(2,)\
 		);
 		exposing_mode = sequencer.Mode(name='exposing', n_loops=0, next_mode_name='init_sweep_out');
@@ -757,35 +1056,11 @@ class CCD_230_42(_CCD):
 
 
 		# INIT SWEEP OUT
-		init_sweep_out_states = sequencer.State.from_labels_array \
+		init_sweep_out_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,0,0,0,0,),
-				'PC2D' : (0,0,0,0,0,0,0,),
-				'PC3D' : (0,0,0,0,0,0,0,),
-				'PC4D' : (0,0,0,0,0,0,0,),
-				'PC1U' : (0,0,0,0,0,0,0,),
-				'PC2U' : (0,0,0,0,0,0,0,),
-				'PC3U' : (0,0,0,0,0,0,0,),
-				'PC4U' : (0,0,0,0,0,0,0,),
-				'SC1L' : (0,0,0,0,1,1,1,),
-				'SC2L' : (1,1,1,0,0,0,1,),
-				'SC1R' : (0,0,0,0,1,1,1,),
-				'SC2R' : (1,1,1,0,0,0,1,),
-				'SCO'  : (0,0,1,1,1,0,0,),
-				'TGD'  : (0,0,0,0,0,0,0,),
-				'TGU'  : (0,0,0,0,0,0,0,),
-				'ORL'  : (1,0,0,0,0,0,0,),
-				'ORR'  : (1,0,0,0,0,0,0,),
-				'SWOL' : (0,0,1,1,1,0,0,),
-				'SWOR' : (0,0,1,1,1,0,0,),
-				'DGD'  : (0,0,0,0,0,0,0,),
-				'DGU'  : (0,0,0,0,0,0,0,),
-				# 'PIXT' : (0,0,0,0,0,0,0,),
-				'PIXT' : (1,1,1,1,1,1,1,),
-				'CRST' : (0,0,0,0,0,0,0,),
-			},
+			self._mode_bits_pins,
+			self._init_sweep_out_bits,
 			(16, 10, 4, 32, 4, 32, 4,)\
 		);
 		init_sweep_out_mode = sequencer.Mode(name='init_sweep_out', n_loops=1, next_mode_name='sweep_out');
@@ -794,35 +1069,11 @@ class CCD_230_42(_CCD):
 
 
 		# SWEEP OUT 
-		sweep_out_states = sequencer.State.from_labels_array \
+		sweep_out_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,0,0,0,0,0,),
-				'PC2D' : (0,0,0,0,0,0,0,0,),
-				'PC3D' : (0,0,0,0,0,0,0,0,),
-				'PC4D' : (0,0,0,0,0,0,0,0,),
-				'PC1U' : (0,0,0,0,0,0,0,0,),
-				'PC2U' : (0,0,0,0,0,0,0,0,),
-				'PC3U' : (0,0,0,0,0,0,0,0,),
-				'PC4U' : (0,0,0,0,0,0,0,0,),
-				'SC1L' : (0,0,0,0,0,1,1,1,),
-				'SC2L' : (1,1,1,1,0,0,0,1,),
-				'SC1R' : (0,0,0,0,0,1,1,1,),
-				'SC2R' : (1,1,1,1,0,0,0,1,),
-				'SCO'  : (0,0,0,1,1,1,0,0,),
-				'TGD'  : (0,0,0,0,0,0,0,0,),
-				'TGU'  : (0,0,0,0,0,0,0,0,),
-				'ORL'  : (0,1,0,0,0,0,0,0,),
-				'ORR'  : (0,1,0,0,0,0,0,0,),
-				'SWOL' : (0,0,0,1,1,1,0,0,),
-				'SWOR' : (0,0,0,1,1,1,0,0,),
-				'DGD'  : (0,0,0,0,0,0,0,0,),
-				'DGU'  : (0,0,0,0,0,0,0,0,),
-				# 'PIXT' : (0,0,0,0,0,0,0,0,),
-				'PIXT' : (1,1,1,1,1,1,1,1,),
-				'CRST' : (0,0,0,0,0,0,0,0,),
-			},
+			self._mode_bits_pins,
+			self._sweep_out_bits,
 			(10, 6, 10, 4, 32, 4, 32, 4,)\
 		);
 		sweep_out_mode = sequencer.Mode(name='sweep_out', n_loops=n_cols-1, next_mode_name='end_sweep_out');
@@ -831,35 +1082,11 @@ class CCD_230_42(_CCD):
 
 
 		# END SWEEP OUT 2
-		end_sweep_out_states = sequencer.State.from_labels_array \
+		end_sweep_out_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,),
-				'PC2D' : (0,0,),
-				'PC3D' : (0,0,),
-				'PC4D' : (0,0,),
-				'PC1U' : (0,0,),
-				'PC2U' : (0,0,),
-				'PC3U' : (0,0,),
-				'PC4U' : (0,0,),
-				'SC1L' : (1,1,),
-				'SC2L' : (1,1,),
-				'SC1R' : (1,1,),
-				'SC2R' : (1,1,),
-				'SCO'  : (0,0,),
-				'TGD'  : (0,0,),
-				'TGU'  : (0,0,),
-				'ORL'  : (0,1,),
-				'ORR'  : (0,1,),
-				'SWOL' : (0,0,),
-				'SWOR' : (0,0,),
-				'DGD'  : (0,0,),
-				'DGU'  : (0,0,),
-				# 'PIXT' : (0,0,),
-				'PIXT' : (1,0,),
-				'CRST' : (0,1,),
-			},
+			self._mode_bits_pins,
+			self._end_sweep_out_bits,
 			(10, 1500,)\
 		);
 		end_sweep_out_mode = sequencer.Mode(name='end_sweep_out', n_loops=1, next_mode_name='parallel');
@@ -868,35 +1095,11 @@ class CCD_230_42(_CCD):
 
 
 		# PARALLEL
-		parallel_states = sequencer.State.from_labels_array \
+		parallel_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,1,1,1,0,0,),
-				'PC2D' : (0,0,0,0,1,1,1,0,),
-				'PC3D' : (1,1,0,0,0,0,0,0,),
-				'PC4D' : (0,1,1,1,1,0,0,0,),
-				'PC1U' : (0,0,0,1,1,1,0,0,),
-				'PC2U' : (0,0,0,0,1,1,1,0,),
-				'PC3U' : (1,1,0,0,0,0,0,0,),
-				'PC4U' : (0,1,1,1,1,0,0,0,),
-				'SC1L' : (1,1,1,1,1,1,1,1,),
-				'SC2L' : (1,1,1,1,1,1,1,1,),
-				'SC1R' : (1,1,1,1,1,1,1,1,),
-				'SC2R' : (1,1,1,1,1,1,1,1,),
-				'SCO'  : (0,0,0,0,0,0,0,0,),
-				'TGD'  : (0,0,0,1,1,1,0,0,),
-				'TGU'  : (0,0,0,1,1,1,0,0,),
-				'ORL'  : (1,1,1,1,1,1,1,1,),
-				'ORR'  : (1,1,1,1,1,1,1,1,),
-				'SWOL' : (0,0,0,0,0,0,0,0,),
-				'SWOR' : (0,0,0,0,0,0,0,0,),
-				'DGD'  : (0,0,0,0,0,0,0,0,),
-				'DGU'  : (0,0,0,0,0,0,0,0,),
-				# 'PIXT' : (0,0,0,0,0,0,0,0,),
-				'PIXT' : (0,0,0,0,0,0,0,0,),
-				'CRST' : (1,1,1,1,1,1,1,1,),
-			},
+			self._mode_bits_pins,
+			self._parallel_bits,
 			(1500, 1500, 1500, 1500, 1500, 1500, 1500, 1500,)\
 		);
 		parallel_mode = sequencer.Mode(name='parallel', n_loops=y_bin, next_mode_name='init_binning');
@@ -905,35 +1108,11 @@ class CCD_230_42(_CCD):
 
 
 		# INIT BINNING
-		init_binning_states = sequencer.State.from_labels_array \
+		init_binning_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,0,),
-				'PC2D' : (0,0,0,0,),
-				'PC3D' : (0,0,0,0,),
-				'PC4D' : (0,0,0,0,),
-				'PC1U' : (0,0,0,0,),
-				'PC2U' : (0,0,0,0,),
-				'PC3U' : (0,0,0,0,),
-				'PC4U' : (0,0,0,0,),
-				'SC1L' : (0,0,0,0,),
-				'SC2L' : (1,1,1,0,),
-				'SC1R' : (0,0,0,0,),
-				'SC2R' : (1,1,1,0,),
-				'SCO'  : (0,0,1,1,),
-				'TGD'  : (0,0,0,0,),
-				'TGU'  : (0,0,0,0,),
-				'ORL'  : (1,0,0,0,),
-				'ORR'  : (1,0,0,0,),
-				'SWOL' : (0,0,1,1,),
-				'SWOR' : (0,0,1,1,),
-				'DGD'  : (0,0,0,0,),
-				'DGU'  : (0,0,0,0,),
-				# 'PIXT' : (0,0,0,0,),
-				'PIXT' : (1,1,1,1,),
-				'CRST' : (1,0,0,0,),
-			},
+			self._mode_bits_pins,
+			self._init_binning_bits,
 			(16, 10, 4, 12 + video_fall_time,)\
 		);
 		init_binning_mode = sequencer.Mode(name='init_binning', n_loops=1, next_mode_name='binning');
@@ -942,68 +1121,21 @@ class CCD_230_42(_CCD):
 
 
 		# BINNING REPEAT
-		binning_repeat_states = sequencer.State.from_labels_array \
+		binning_repeat_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,0,0,0,0,0,0,),
-				'PC2D' : (0,0,0,0,0,0,0,0,0,),
-				'PC3D' : (0,0,0,0,0,0,0,0,0,),
-				'PC4D' : (0,0,0,0,0,0,0,0,0,),
-				'PC1U' : (0,0,0,0,0,0,0,0,0,),
-				'PC2U' : (0,0,0,0,0,0,0,0,0,),
-				'PC3U' : (0,0,0,0,0,0,0,0,0,),
-				'PC4U' : (0,0,0,0,0,0,0,0,0,),
-				'SC1L' : (0,1,1,1,0,0,0,0,0,),
-				'SC2L' : (0,0,0,1,1,1,1,1,0,),
-				'SC1R' : (0,1,1,1,0,0,0,0,0,),
-				'SC2R' : (0,0,0,1,1,1,1,1,0,),
-				'SCO'  : (1,1,0,0,0,0,0,1,1,),
-				'TGD'  : (0,0,0,0,0,0,0,0,0,),
-				'TGU'  : (0,0,0,0,0,0,0,0,0,),
-				'ORL'  : (0,0,0,0,0,1,0,0,0,),
-				'ORR'  : (0,0,0,0,0,1,0,0,0,),
-				'SWOL' : (1,1,1,1,1,1,1,1,1,),
-				'SWOR' : (1,1,1,1,1,1,1,1,1,),
-				'DGD'  : (0,0,0,0,0,0,0,0,0,),
-				'DGU'  : (0,0,0,0,0,0,0,0,0,),
-				'PIXT' : (1,1,1,1,1,1,1,1,1,),
-				'CRST' : (0,0,0,0,0,0,0,0,0,),
-			},
+			self._mode_bits_pins,
+			self._binning_repeat_bits,
 			(20 - video_fall_time, 4, 32, 4, 10, 6, 10, 4, 12 + video_fall_time,)\
 		);
 
 
 		# BINNING SAMPLE
-		binning_sample_states = sequencer.State.from_labels_array \
+		binning_sample_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,0,0,0,0,0,0,),
-				'PC2D' : (0,0,0,0,0,0,0,0,0,),
-				'PC3D' : (0,0,0,0,0,0,0,0,0,),
-				'PC4D' : (0,0,0,0,0,0,0,0,0,),
-				'PC1U' : (0,0,0,0,0,0,0,0,0,),
-				'PC2U' : (0,0,0,0,0,0,0,0,0,),
-				'PC3U' : (0,0,0,0,0,0,0,0,0,),
-				'PC4U' : (0,0,0,0,0,0,0,0,0,),
-				'SC1L' : (0,1,1,1,0,0,0,0,0,),
-				'SC2L' : (0,0,0,1,1,1,1,1,0,),
-				'SC1R' : (0,1,1,1,0,0,0,0,0,),
-				'SC2R' : (0,0,0,1,1,1,1,1,0,),
-				'SCO'  : (1,1,0,0,0,0,0,1,1,),
-				'TGD'  : (0,0,0,0,0,0,0,0,0,),
-				'TGU'  : (0,0,0,0,0,0,0,0,0,),
-				'ORL'  : (0,0,0,0,0,1,0,0,0,),
-				'ORR'  : (0,0,0,0,0,1,0,0,0,),
-				'SWOL' : (1,1,0,0,0,0,0,1,1,),
-				'SWOR' : (1,1,0,0,0,0,0,1,1,),
-				'DGD'  : (0,0,0,0,0,0,0,0,0,),
-				'DGU'  : (0,0,0,0,0,0,0,0,0,),
-				# 'PIXT' : (1,1,1,1,1,1,1,0,0,),
-				'PIXT' : (1,1,1,1,1,1,1,1,1,),
-				'CRST' : (0,0,0,0,0,1,0,0,0,),
-			},
+			self._mode_bits_pins,
+			self._binning_sample_bits,
 			(20 - video_fall_time, 4, 32, 4, 10, 6, 10, 4, 12 + video_fall_time,)\
 		);
 
@@ -1016,35 +1148,11 @@ class CCD_230_42(_CCD):
 
 
 		# BINNING END
-		end_binning_states = sequencer.State.from_labels_array \
+		end_binning_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,0,0,0,0,0,0,),
-				'PC2D' : (0,0,0,0,0,0,0,),
-				'PC3D' : (0,0,0,0,0,0,0,),
-				'PC4D' : (0,0,0,0,0,0,0,),
-				'PC1U' : (0,0,0,0,0,0,0,),
-				'PC2U' : (0,0,0,0,0,0,0,),
-				'PC3U' : (0,0,0,0,0,0,0,),
-				'PC4U' : (0,0,0,0,0,0,0,),
-				'SC1L' : (0,1,1,1,1,1,1,),
-				'SC2L' : (0,0,0,1,1,1,1,),
-				'SC1R' : (0,1,1,1,1,1,1,),
-				'SC2R' : (0,0,0,1,1,1,1,),
-				'SCO'  : (1,1,0,0,0,0,0,),
-				'TGD'  : (0,0,0,0,0,0,0,),
-				'TGU'  : (0,0,0,0,0,0,0,),
-				'ORL'  : (0,0,0,0,0,1,1,),
-				'ORR'  : (0,0,0,0,0,1,1,),
-				'SWOL' : (1,1,0,0,0,0,0,),
-				'SWOR' : (1,1,0,0,0,0,0,),
-				'DGD'  : (0,0,0,0,0,0,0,),
-				'DGU'  : (0,0,0,0,0,0,0,),
-				# 'PIXT' : (1,1,1,1,1,1,0,),
-				'PIXT' : (1,1,1,1,1,1,0,),
-				'CRST' : (0,0,0,0,0,1,1,),
-			},
+			self._mode_bits_pins,
+			self._end_binning_bits,
 			(20 - video_fall_time, 4, 32, 4, 10, 16, 1500,)\
 		);
 		end_binning_mode = sequencer.Mode(name='end_binning', n_loops=1, next_mode_name='cleaning_init', parent_mode_name = 'parallel', nested_loops = int(ceil(float(n_rows)/float(y_bin))));
@@ -1056,34 +1164,11 @@ class CCD_230_42(_CCD):
 
 
 		# CLEANING INIT
-		cleaning_init_states = sequencer.State.from_labels_array \
+		cleaning_init_states = sequencer.State.from_bits_array \
 		( \
 			labels,
-			{ \
-				'PC1D' : (0,),
-				'PC2D' : (0,),
-				'PC3D' : (0,),
-				'PC4D' : (0,),
-				'PC1U' : (0,),
-				'PC2U' : (0,),
-				'PC3U' : (0,),
-				'PC4U' : (0,),
-				'SC1L' : (1,),
-				'SC2L' : (1,),
-				'SC1R' : (1,),
-				'SC2R' : (1,),
-				'SCO'  : (0,),
-				'TGD'  : (0,),
-				'TGU'  : (0,),
-				'ORL'  : (1,),
-				'ORR'  : (1,),
-				'SWOL' : (0,),
-				'SWOR' : (0,),
-				'DGD'  : (1,),
-				'DGU'  : (1,),
-				'PIXT' : (0,),
-				'CRST' : (1,),
-			},
+			self._mode_bits_pins,
+			self._cleaning_init_bits,
 			(1500,)\
 		);
 		cleaning_init_mode = sequencer.Mode(name='cleaning_init', n_loops=1, next_mode_name='cleaning_repeat');
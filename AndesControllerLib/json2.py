@@ -13,17 +13,103 @@
 # @see JSONDecoder
 
 import json as json
+import math as math
+import re as re
+import types as types
+import weakref as weakref
 
-## Just an alias for python's json.dumps;
-dumps = json.dumps;
+# orjson is optional, it only speeds up dumps and loads.
+try:
+  import orjson as orjson;
+except ImportError:
+  orjson = None;
 
-## Just an alias for python's json.loads;
-loads = json.loads;
+## The orjson options of dumps and dumpb. Non str keys are converted to str, as python's json does.
+_orjson_options = 0;
+if(orjson is not None):
+  _orjson_options = getattr(orjson, 'OPT_NON_STR_KEYS', 0) | getattr(orjson, 'OPT_SERIALIZE_DATACLASS', 0);
+
+## orjson.Fragment, for RawJSON objects. None if orjson is not installed or too old to have it.
+_orjson_fragment = getattr(orjson, 'Fragment', None);
+
+## Matches numbers that may not fit in 64 bits, orjson would decode them as floats.
+# Any run of 19 digits is matched: it may be below the int64 minimum or above the uint64 maximum.
+_long_number       = re.compile(r'[0-9]{19}');
+_long_number_bytes = re.compile(b'[0-9]{19}');
+
+## Text types (str and, on python 2, unicode).
+# @note For internal use only.
+try:
+  _text_types = (str, unicode);
+except NameError:
+  _text_types = (str,);
+
+## Marks a class not looked up yet in _to_dict_cache.
+_missing = object();
+
+## The _to_dict function of each encoded class (None if it has none).
+# Classes are weakly referenced, the entry goes away with its class. json_serializable clears it.
+# @note For internal use only.
+_to_dict_cache = weakref.WeakKeyDictionary();
+
+## Matches the placeholders JSONEncoder.default writes for RawJSON objects.
+_raw_json_placeholder = re.compile(r'"\\u0000RawJSON([0-9]+)\\u0000"');
+
+## Already encoded json text, inserted as is by JSONEncoder and dumps.
+#
+# Avoids decoding and encoding again json that is already at hand (e.g. cached configurations).
+class RawJSON(object):
+  __slots__ = ('s',);
+
+  ## Initializes a RawJSON
+  #
+  # @param self An instance of RawJSON.
+  # @param s (str) The json text, it is not validated.
+  #
+  def __init__(self, s):
+    self.s = s;
+  ## @var s
+  # (str) The json text.
 
 ## This Encoder encodes just like python's json.JSONEncoder with some exceptions
 # @see default 
 class JSONEncoder(json.JSONEncoder):
 
+  ## Default value of fail_on_missing_interface.
+  fail_on_missing_interface = False;
+
+  ## Initializes an encoder
+  #
+  # @param self An instance of JSONEncoder.
+  # @param fail_on_missing_interface (bool) Overrides the class fail_on_missing_interface if not None.
+  # @param kwargs The keyword arguments of python's json.JSONEncoder.
+  #
+  def __init__(self, fail_on_missing_interface = None, **kwargs):
+    json.JSONEncoder.__init__(self, **kwargs);
+    if(fail_on_missing_interface is not None):
+      self.fail_on_missing_interface = fail_on_missing_interface;
+    self._raw_fragments = None;
+
+  ## Encodes o as json text.
+  #
+  # Same as python's json.JSONEncoder.encode, RawJSON objects are written as placeholders
+  # by default and replaced with their text at the end.
+  #
+  # @param self An instance of JSONEncoder.
+  # @param o The object to encode.
+  #
+  # @returns The json text.
+  def encode(self, o):
+    previous  = self._raw_fragments;
+    fragments = self._raw_fragments = [];
+    try:
+      text = json.JSONEncoder.encode(self, o);
+    finally:
+      self._raw_fragments = previous;
+    if(fragments):
+      text = _raw_json_placeholder.sub(lambda m: fragments[int(m.group(1))], text);
+    return text;
+
   ## The encoding function.
   #
   # This function expects the object to contain a ._to_dict() that returns a dictionary of
@@ -32,23 +118,107 @@ class JSONEncoder(json.JSONEncoder):
   # If none of the above applies, the encoder will return the object dictionary plus a __class__
   # atribute, storing the class name of the object.
   #
+  # The ._to_dict() function is looked up once per class: a _to_dict set on a class after one of
+  # its objects was encoded is not seen, unless it is set with json_serializable. An object of a
+  # class without ._to_dict() may still have its own (an instance attribute), it is called with no
+  # arguments.
+  #
+  # RawJSON objects are only supported by .encode() (and so by dumps).
+  #
   # @param self An instance of JSONEncoder
   # @param obj The object to be encoded.
   #
   def default(self, obj):
-    if hasattr(obj,'_to_dict'):
-      return obj._to_dict()
-    elif hasattr(self, 'fail_on_missing_interface') and self.fail_on_missing_interface:
-      return json.Encoder.default(self, obj)
+    cls = obj.__class__;
+    if(cls is RawJSON):
+      if(self._raw_fragments is None):
+        raise ValueError('RawJSON can only be encoded with JSONEncoder.encode.');
+      self._raw_fragments.append(obj.s);
+      return '\x00RawJSON' + str(len(self._raw_fragments) - 1) + '\x00';
+
+    to_dict = _to_dict_cache.get(cls, _missing);
+    if(to_dict is _missing):
+      to_dict = getattr(cls, '_to_dict', None);
+      _to_dict_cache[cls] = to_dict;
+
+    if(to_dict is not None):
+      return to_dict(obj);
+    to_dict = getattr(obj, '_to_dict', None);
+    if(to_dict is not None):
+      return to_dict();
+    elif(self.fail_on_missing_interface):
+      return json.JSONEncoder.default(self, obj);
     else:
-      result = dict(obj.__dict__);
-      result['__class__'] = obj.__class__.__name__;
-      return result;
-  # @var fail_on_missing_interface (optional) if set to true the encoder will use python's default encoding when the object does not have the expected ._to_dict() function.
+      return dict(obj.__dict__, __class__ = cls.__name__);
+  ## @var fail_on_missing_interface
+  # (bool) If set to true the encoder will use python's default encoding when the object does not have the expected ._to_dict() function.
+  ## @var _raw_fragments
+  # (list) The text of the RawJSON objects found by the running .encode() call, None outside of it.
+
+## Gets the attribute names a json_serializable class stores.
+# @note For internal use only.
+#
+# @param cls A class with __slots__ (including inherited ones).
+#
+# @returns A list of tuple(key, attribute) with the json key and the (mangled) attribute name of each field.
+def _serializable_fields(cls):
+  if(issubclass(cls, tuple)):
+    # python's json writes tuples (namedtuples included) as arrays and never asks for _to_dict.
+    raise ValueError('Class ' + cls.__name__ + ' is a tuple, json writes it as an array.');
 
-## A dummy class just so JSONDecoder can instance an object before setting it's class.   
-class _Dummy:
-  pass;
+  fields = [];
+  for klass in reversed(cls.__mro__):
+    slots = klass.__dict__.get('__slots__', ());
+    if(isinstance(slots, str)):
+      slots = (slots,);
+    for k in slots:
+      if(k in ('__dict__', '__weakref__')):
+        continue;
+      attribute = k;
+      if(k.startswith('__') and not k.endswith('__')):
+        attribute = '_' + klass.__name__.lstrip('_') + k;
+      fields.append((k, attribute));
+  if(not fields):
+    raise ValueError('Class ' + cls.__name__ + ' has no __slots__ to serialize.');
+  return fields;
+
+## Class decorator that adds a generated _to_dict and _from_dict to a class.
+#
+# The class is inspected once: its fields are taken from __slots__ and straight-line functions are compiled for them, so JSONEncoder and JSONDecoder do not
+# need any reflection for its objects. _to_dict also stores the __class__ key.
+#
+# @param cls The class to decorate.
+#
+# @returns The same class.
+def json_serializable(cls):
+  fields = _serializable_fields(cls);
+  items  = ''.join(['%r: self.%s, ' % (k, a) for (k, a) in fields]);
+  source = 'def _to_dict(self):\n  return {' + items + '%r: %r};\n' % ('__class__', cls.__name__);
+  source += 'def _from_dict(cls, dct):\n  result = cls.__new__(cls);\n';
+  source += ''.join(['  result.%s = dct[%r];\n' % (a, k) for (k, a) in fields]);
+  source += '  return result;\n';
+
+  namespace = {};
+  exec(compile(source, '<json_serializable ' + cls.__name__ + '>', 'exec'), namespace);
+  cls._to_dict   = namespace['_to_dict'];
+  cls._from_dict = classmethod(namespace['_from_dict']);
+  # Drop what was cached before (for the class or its subclasses).
+  _to_dict_cache.clear();
+  return cls;
+
+## Builds an object of cls with dct as its __dict__, without calling cls.__init__.
+# @note For internal use only.
+#
+# @param cls The class of the object, classic (python 2 old-style) classes are supported.
+# @param dct The dictionary to use as the object's __dict__, as is.
+#
+# @returns The new object.
+def _new_object(cls, dct):
+  if(isinstance(cls, type)):
+    result = object.__new__(cls);
+    result.__dict__ = dct;
+    return result;
+  return types.InstanceType(cls, dct);
 
 ## This Encoder encodes just like python's json.JSONDecoder with some exceptions
 # @see __call__ 
@@ -61,29 +231,224 @@ class JSONDecoder(json.JSONDecoder):
   def __init__(self, cls = None):
     self.cls = cls;
 
+    # Resolved once, __call__ runs for every decoded dictionary.
+    self._from_dict = None;
+    self._cls_name  = _missing;
+    if(cls is not None):
+      self._from_dict = getattr(cls, '_from_dict', None);
+      self._cls_name  = cls.__name__;
+
   ## The decoding function.
   #
   # This function expects the class to contain a ._from_dict() that recieves a dictionary of
   # it's json representation. If this function is not present and the encoder object has
-  # a cls attribute having the same name as the __class__ key in dct, a object will be created
-  # overwriting its __dict__ with dct and __class__ with cls. If none of the above applies, 
+  # a cls attribute having the same name as the __class__ key in dct, an object of cls will be
+  # created (without calling cls.__init__) having dct as its __dict__. If none of the above applies,
   # dct will be returned as-is.
   #
   # @param self An instance of JSONDecoder
   # @param dct A dictionary containig the json data.
   #
   def __call__(self, dct):
-    cls = self.cls;
-    if(cls and hasattr(cls, '_from_dict')):
-      return cls._from_dict(dct);
+    from_dict = self._from_dict;
+    if(from_dict is not None):
+      return from_dict(dct);
     else:
-      if'__class__' in dct and dct['__class__'] == cls.__name__:
-        result = _Dummy();
-        result.__class__ = cls;
-        del dct['__class__'];
-        result.__dict__.update(dct);
-        return result;
+      if(dct.get('__class__') == self._cls_name):
+        # dct is a fresh dictionary made by the json decoder, it becomes the object's __dict__ as is.
+        dct.pop('__class__');
+        return _new_object(self.cls, dct);
       return dct;
   ## @var cls
   # The class of the object to decode.
+  ## @var _from_dict
+  # The ._from_dict() function of cls, None if it has none.
+  ## @var _cls_name
+  # The name of cls, matched against the __class__ key of each dictionary.
+
+## The encoder used by dumps to encode objects json can not represent.
+_default_encoder = JSONEncoder();
+
+## The encoder used by dumps and dumpb when no keyword arguments are given and orjson is not used.
+# It is made once, and writes compact utf-8 text like orjson. The text decodes to the same values,
+# but floats may be written differently (e.g. 1e+16 where orjson writes 1e16).
+_compact_encoder = JSONEncoder(separators = (',', ':'), ensure_ascii = False);
+
+## The default function given to orjson.
+#
+# RawJSON objects become orjson Fragments, or make orjson fail (so dumps falls back to python's
+# json) if the installed orjson has no Fragment. Tuple subclasses (namedtuples) become arrays,
+# as python's json writes them.
+#
+# @param obj The object to be encoded.
+def _orjson_default(obj):
+  if(obj.__class__ is RawJSON):
+    if(_orjson_fragment is None):
+      raise TypeError('orjson.Fragment is not available.');
+    return _orjson_fragment(obj.s);
+  if(isinstance(obj, tuple)):
+    return list(obj);
+  return _default_encoder.default(obj);
+
+## Checks if value may hold a float orjson writes differently than python's json (NaN or an infinity).
+#
+# Containers are searched, any other object that is not a plain scalar counts as a possible match,
+# since it is encoded through _orjson_default.
+# @note For internal use only.
+#
+# @param value The value to check.
+#
+# @returns True if value may hold a non finite float.
+def _may_have_non_finite(value):
+  t = type(value);
+  if(t is float):
+    return math.isnan(value) or math.isinf(value);
+  if(t is dict):
+    for k in value:
+      if(_may_have_non_finite(k) or _may_have_non_finite(value[k])):
+        return True;
+    return False;
+  if(t is list or t is tuple):
+    for v in value:
+      if(_may_have_non_finite(v)):
+        return True;
+    return False;
+  return not (value is None or t is bool or t is int or t is str or isinstance(value, _text_types));
+
+## Encodes obj with orjson.
+#
+# orjson writes null for NaN and infinities, where python's json writes NaN, Infinity and
+# -Infinity. Only output with a null is searched for those.
+# @note For internal use only.
+#
+# @param obj The object to encode.
+#
+# @returns The json text (bytes), or None if python's json must be used instead.
+def _orjson_dumps(obj):
+  try:
+    data = orjson.dumps(obj, default=_orjson_default, option=_orjson_options);
+  except TypeError:
+    return None;
+  if(b'null' in data and _may_have_non_finite(obj)):
+    return None;
+  return data;
+
+## Encodes obj as json text, classes are encoded as JSONEncoder does.
+#
+# Uses orjson when it is installed and no keyword arguments are given, or else a shared JSONEncoder
+# writing compact text too. Keyword arguments make it the same as python's json.dumps
+# with cls=JSONEncoder.
+#
+# Both paths give semantically equal json, not byte-identical text: the formatting of floats
+# depends on which one ran (see _compact_encoder), so do not compare dumps outputs as strings.
+#
+# @param obj The object to encode.
+# @param kwargs The keyword arguments of python's json.dumps.
+#
+# @returns The json text (str).
+def dumps(obj, **kwargs):
+  if(not kwargs):
+    if(orjson is not None):
+      data = _orjson_dumps(obj);
+      if(data is not None):
+        return data.decode('utf-8');
+    return _compact_encoder.encode(obj);
+  kwargs.setdefault('cls', JSONEncoder);
+  return json.dumps(obj, **kwargs);
+
+## Encodes obj as utf-8 json bytes, to write to binary files or sockets without encoding the text again.
+#
+# Same as dumps, but orjson's output is returned as is.
+#
+# @param obj The object to encode.
+# @param kwargs The keyword arguments of python's json.dumps.
+#
+# @returns The json text (bytes).
+def dumpb(obj, **kwargs):
+  if(orjson is not None and not kwargs):
+    data = _orjson_dumps(obj);
+    if(data is not None):
+      return data;
+  text = dumps(obj, **kwargs);
+  if(isinstance(text, bytes)):
+    return text;
+  return text.encode('utf-8');
+
+## Applies object_hook to every dictionary in value, innermost first (as python's json.loads does).
+#
+# @param value A decoded json value.
+# @param object_hook A function(dct) returning the object to use instead of dct.
+#
+# @returns value, with its dictionaries replaced by the object_hook results.
+def _apply_object_hook(value, object_hook):
+  if(type(value) is dict):
+    for k in value:
+      value[k] = _apply_object_hook(value[k], object_hook);
+    return object_hook(value);
+  elif(type(value) is list):
+    for ii in range(len(value)):
+      value[ii] = _apply_object_hook(value[ii], object_hook);
+  return value;
 
+## Turns the dictionaries of a decoded json value tagged with __class__ into objects, innermost first.
+#
+# Objects are built like JSONDecoder does: with the class ._from_dict() if it has one, otherwise
+# the dictionary becomes the object's __dict__. Dictionaries with an unknown __class__ are kept.
+#
+# @param node A decoded json value.
+# @param registry A dictionary {class name: class} of the classes to build.
+#
+# @returns node, with its tagged dictionaries replaced by objects.
+def _rehydrate(node, registry):
+  t = type(node);
+  if(t is dict):
+    for k in node:
+      v = node[k];
+      if(type(v) is dict or type(v) is list):
+        node[k] = _rehydrate(v, registry);
+    cls_name = node.get('__class__');
+    cls = registry.get(cls_name) if cls_name is not None else None;
+    if(cls is not None):
+      from_dict = getattr(cls, '_from_dict', None);
+      if(from_dict is not None):
+        return from_dict(node);
+      node.pop('__class__');
+      return _new_object(cls, node);
+  elif(t is list):
+    for ii in range(len(node)):
+      v = node[ii];
+      if(type(v) is dict or type(v) is list):
+        node[ii] = _rehydrate(v, registry);
+  return node;
+
+## Decodes json text.
+#
+# Uses orjson when it is installed and no keyword arguments other than object_hook are given
+# (object_hook, e.g. a JSONDecoder, is then applied on the decoded data). Otherwise (or if orjson
+# rejects the text, or the text has numbers too long for it) it is the same as python's json.loads.
+#
+# If classes is given the text is decoded to plain data first and the dictionaries tagged with the
+# name of one of the classes are turned into objects in a single pass (see _rehydrate), which is
+# cheaper than an object_hook called for every dictionary while parsing.
+#
+# @param s (str/bytes) The json text.
+# @param classes A list of the classes that may be found in s, or None.
+# @param kwargs The keyword arguments of python's json.loads.
+#
+# @returns The decoded object.
+def loads(s, classes = None, **kwargs):
+  if(classes is not None):
+    registry = dict([(cls.__name__, cls) for cls in classes]);
+    return _rehydrate(loads(s, **kwargs), registry);
+  if(orjson is not None and set(kwargs) <= set(['object_hook'])):
+    long_number = _long_number if isinstance(s, str) else _long_number_bytes;
+    if(long_number.search(s) is not None):
+      return json.loads(s, **kwargs);
+    try:
+      result = orjson.loads(s);
+    except ValueError:
+      return json.loads(s, **kwargs);
+    if(kwargs.get('object_hook') is not None):
+      result = _apply_object_hook(result, kwargs['object_hook']);
+    return result;
+  return json.loads(s, **kwargs);
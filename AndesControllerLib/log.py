@@ -9,18 +9,83 @@
 # just prints the messages to stdout, appending [INFO   ], [WARNING] or [ERROR  ] 
 # depending on the message type.
 
-import six as six;
+import sys as sys;
+import atexit as atexit;
+import threading as threading;
+import traceback as traceback;
+try:
+  import queue as queue;
+except ImportError:
+  import Queue as queue;
+
+## Prefixes of the messages written by the default logging functions.
+_info_prefix    = '[INFO   ] : ';
+_warning_prefix = '[WARNING] : ';
+_error_prefix   = '[ERROR  ] : ';
+
+## Writes a prefixed line to stdout, without concatenating its parts.
+# @param prefix (str) The line prefix.
+# @param m The message.
+def _write_line(prefix, m):
+  if(not isinstance(m, str)):
+    m = '%s' % (m,);
+  sys.stdout.writelines((prefix, m, '\n'));
+
+## Writes an info message to stdout, the default info function.
+# @param m The message.
+def _write_info(m):
+  _write_line(_info_prefix, m);
+
+## Writes a warning message to stdout, the default warning function.
+# @param m The message.
+def _write_warning(m):
+  _write_line(_warning_prefix, m);
+
+## Writes an error message to stdout, the default error function.
+# @param m The message.
+def _write_error(m):
+  _write_line(_error_prefix, m);
+
+## Does nothing, the info, warning and error of a _Log that logs nothing.
+# @param args Ignored.
+# @param kwargs Ignored.
+def _noop(*args, **kwargs):
+  pass;
+
+## A log message argument computed only when the message is logged.
+#
+#  Example: context.info('Data: %s', 4, log.Lazy(lambda: expensive_dump(data)))
+#
+#  Other arguments, callables included, are formatted as they are.
+class Lazy(object):
+  ## Every attribute a Lazy holds.
+  __slots__ = ('fn',);
+
+  ## Initializes a Lazy.
+  #  @param self An instance of Lazy.
+  #  @param fn A function() returning the value to format.
+  def __init__(self, fn):
+    self.fn = fn;
+
+  ## @var fn
+  #  (function()) Returns the value to format, called once the message is logged.
 
 ## Holder of logging functions. Serves as a context for logging.
-class _Log:
+class _Log(object):
+  ## Every attribute a _Log holds. Instances have no __dict__.
+  __slots__ = ('info_fn', 'warning_fn', 'error_fn', '_verbosity', 'info', 'warning', 'error');
+
+  ## The settings configure accepts.
+  _settings = frozenset(['info_fn', 'warning_fn', 'error_fn', 'verbosity']);
+
   ## Initializes a _Log
   #  @param self An instance of _Log.
   #  @note Use the methods log.get_default_context and log.new_context to get a logger.
   def __init__(self):
 
-    self.info_fn    = lambda m : six.print_('[INFO   ] : ' + str(m));
-    self.warning_fn = lambda m : six.print_('[WARNING] : ' + str(m));
-    self.error_fn   = lambda m : six.print_('[ERROR  ] : ' + str(m));
+    self.info_fn    = _write_info;
+    self.warning_fn = _write_warning;
+    self.error_fn   = _write_error;
     self.verbosity  = 5;
 
   ## Sets the info logging function.
@@ -41,38 +106,129 @@ class _Log:
   def set_error_fn(self, error_fn):
     self.error_fn = error_fn;
 
+  ## Sets several settings at once.
+  #
+  #  Example: context.configure(info_fn = f, warning_fn = f, error_fn = f, verbosity = 3)
+  #
+  #  @param self An instance of _Log.
+  #  @param kwargs Any of info_fn, warning_fn, error_fn (see the set_*_fn methods) and verbosity (see set_verbosity).
+  def configure(self, **kwargs):
+    for k in kwargs:
+      if(k not in _Log._settings):
+        raise ValueError('Unknown logging setting ' + str(k) + '.');
+    for k in kwargs:
+      setattr(self, k, kwargs[k]);
+
+  ## Sets the verbosity level.
+  #
+  #  With a verbosity of 0 or less nothing is logged: info, warning and error are replaced by a
+  #  function that does nothing, so disabled logging costs a single call.
+  #
+  #  @param self An instance of _Log.
+  #  @param verbosity (int) Mimimum verbosity level of messages that will NOT be logged.
+  def set_verbosity(self, verbosity):
+    self._verbosity = verbosity;
+    if(verbosity > 0):
+      self.info    = self._info;
+      self.warning = self._warning;
+      self.error   = self._error;
+    else:
+      self.info    = _noop;
+      self.warning = _noop;
+      self.error   = _noop;
+
+  ## Gets the verbosity level.
+  #  @param self An instance of _Log.
+  #  @returns (int) The verbosity level.
+  def get_verbosity(self):
+    return self._verbosity;
+
+  verbosity = property(get_verbosity, set_verbosity);
+
+  ## Moves the writing of messages to a background thread.
+  #
+  #  The info, warning and error functions are wrapped by a single BackgroundWriter, so the
+  #  messages keep their order and callers only pay the formatting and a queue put.
+  #  Calling it again reuses the running writer, the functions are never wrapped twice.
+  #
+  #  @param self An instance of _Log.
+  #
+  #  @returns The BackgroundWriter (log.BackgroundWriter), flush or close it to wait for the pending messages.
+  def write_in_background(self):
+    fns = (self.info_fn, self.warning_fn, self.error_fn);
+    writer = None;
+    for fn in fns:
+      if(type(fn) is _QueuedFn and fn.writer.is_running()):
+        writer = fn.writer;
+        break;
+    if(writer is None):
+      writer = BackgroundWriter();
+
+    info_fn, warning_fn, error_fn = [writer.wrap(fn.fn if type(fn) is _QueuedFn else fn) for fn in fns];
+    self.configure(info_fn = info_fn, warning_fn = warning_fn, error_fn = error_fn);
+    return writer;
+
+  ## Formats a message lazily, only called for messages that will be logged.
+  #
+  #  @param self An instance of _Log.
+  #  @param message (str) The message, or its format if args are given.
+  #  @param args (tuple) The values to format the message with. log.Lazy values are evaluated to get their value.
+  #
+  #  @returns The formatted message.
+  def _format(self, message, args):
+    if(not args):
+      return message;
+    return message % tuple([a.fn() if type(a) is Lazy else a for a in args]);
+
+  ## Checks if messages of a verbosity level will be logged.
+  #
+  #  Lets callers skip building messages that would be ommited.
+  #
+  #  @param self An instance of _Log.
+  #  @param verbosity (int) The verbosity level of the message.
+  #
+  #  @returns True if a message with the verbosity level will be logged.
+  def enabled(self, verbosity):
+    return verbosity < self.verbosity;
+
   ## Calls the info function.
   #
-  #  If self.verbosity level is less or equal than the verbosity parameter, the message is ommited.
+  #  If self.verbosity level is less or equal than the verbosity parameter, the message is ommited
+  #  and it is not formatted.
   #
   #  @param self An instance of _Log.
-  #  @param message (str) The message to display.
+  #  @param message (str) The message to display, or its format if args are given.
   #  @param verbosity (int) The verbosity level associated with this message.
-  def info(self, message, verbosity=0):
+  #  @param args The values to format the message with. log.Lazy values are evaluated to get their value.
+  def _info(self, message, verbosity=0, *args):
     if(verbosity < self.verbosity):
-      self.info_fn(message);
+      self.info_fn(self._format(message, args));
 
   ## Calls the warning function.
   #
-  #  If self.verbosity level is less or equal than the verbosity parameter, the message is ommited.
+  #  If self.verbosity level is less or equal than the verbosity parameter, the message is ommited
+  #  and it is not formatted.
   #
   #  @param self An instance of _Log.
-  #  @param message (str) The message to display.
+  #  @param message (str) The message to display, or its format if args are given.
   #  @param verbosity (int) The verbosity level associated with this message.
-  def warning(self, message, verbosity=0):
+  #  @param args The values to format the message with. log.Lazy values are evaluated to get their value.
+  def _warning(self, message, verbosity=0, *args):
     if(verbosity < self.verbosity):
-      self.warning_fn(message);
+      self.warning_fn(self._format(message, args));
 
   ## Calls the error function.
   #
-  #  If self.verbosity level is less or equal than the verbosity parameter, the message is ommited.
+  #  If self.verbosity level is less or equal than the verbosity parameter, the message is ommited
+  #  and it is not formatted.
   #
   #  @param self An instance of _Log.
-  #  @param message (str) The message to display.
+  #  @param message (str) The message to display, or its format if args are given.
   #  @param verbosity (int) The verbosity level associated with this message.
-  def error(self, message, verbosity=0):
+  #  @param args The values to format the message with. log.Lazy values are evaluated to get their value.
+  def _error(self, message, verbosity=0, *args):
     if(verbosity < self.verbosity):
-      self.error_fn(message);
+      self.error_fn(self._format(message, args));
 
   ## @var info_fn
   #  (function(msg:str)) The function that will be called on a self.info call.
@@ -85,37 +241,198 @@ class _Log:
 
   ## @var verbosity
   #  (int) Mimimum verbosity level of messages that will NOT be logged.
+  #  @see set_verbosity
+
+  ## @var info
+  #  (function(message, verbosity=0, *args)) Logs an info message, @see _info.
+
+  ## @var warning
+  #  (function(message, verbosity=0, *args)) Logs a warning message, @see _warning.
+
+  ## @var error
+  #  (function(message, verbosity=0, *args)) Logs an error message, @see _error.
 
-## The default _Log context.
-_log = _Log();
+## The running BackgroundWriters, their pending messages are written before the interpreter exits.
+# @note For internal use only.
+_writers = set();
+
+## Waits for the pending messages of every running BackgroundWriter.
+# @note For internal use only.
+def _flush_writers():
+  for writer in list(_writers):
+    writer.flush();
+
+atexit.register(_flush_writers);
+
+## A logging function whose calls are queued for a BackgroundWriter.
+# Once the writer is closed, messages are written right away.
+# @note For internal use only.
+class _QueuedFn(object):
+  ## Every attribute a _QueuedFn holds.
+  __slots__ = ('fn', 'writer');
+
+  ## Initializes a _QueuedFn.
+  #  @param self An instance of _QueuedFn.
+  #  @param fn A function(msg:str), the wrapped logging function.
+  #  @param writer (log.BackgroundWriter) The writer calling fn.
+  def __init__(self, fn, writer):
+    self.fn     = fn;
+    self.writer = writer;
+
+  ## Queues a message for the wrapped function.
+  #  @param self An instance of _QueuedFn.
+  #  @param m The message.
+  def __call__(self, m):
+    if(self.writer.is_running()):
+      self.writer._queue.put((self.fn, m));
+    else:
+      self.fn(m);
+
+  ## @var fn
+  #  (function(msg:str)) The wrapped logging function.
+
+  ## @var writer
+  #  (log.BackgroundWriter) The writer calling fn.
+
+## Calls logging functions from a background thread.
+#
+# Messages are formatted by the caller (its arguments may change afterwards), only the
+# writing is queued. The pending messages are written before the interpreter exits.
+class BackgroundWriter(object):
+  ## Every attribute a BackgroundWriter holds.
+  __slots__ = ('_queue', '_thread', '_closed');
+
+  ## Initializes a BackgroundWriter and starts its thread.
+  #  @param self An instance of BackgroundWriter.
+  def __init__(self):
+    self._queue  = queue.Queue();
+    self._closed = False;
+    self._thread = threading.Thread(target = self._run);
+    self._thread.daemon = True;
+    self._thread.start();
+    _writers.add(self);
+
+  ## Wraps a logging function so it is called from the background thread.
+  #  @param self An instance of BackgroundWriter.
+  #  @param fn A function(msg:str), like the info_fn of a _Log.
+  #  @returns A function(msg:str) that queues the message for fn.
+  def wrap(self, fn):
+    return _QueuedFn(fn, self);
+
+  ## Checks if the writer still queues messages.
+  #  @param self An instance of BackgroundWriter.
+  #  @returns False once closed.
+  def is_running(self):
+    return not self._closed;
+
+  ## Waits until every queued message has been written.
+  #  @param self An instance of BackgroundWriter.
+  def flush(self):
+    if(self._thread.is_alive()):
+      self._queue.join();
+
+  ## Writes the queued messages and stops the background thread.
+  #  Later messages of the wrapped functions are written right away.
+  #  @param self An instance of BackgroundWriter.
+  def close(self):
+    if(self._closed):
+      return;
+    self._closed = True;
+    self._queue.put(None);
+    self._thread.join();
+    _writers.discard(self);
+
+  ## Body of the background thread.
+  #  A function that fails gets its traceback written to stderr, the next messages are still written.
+  #  @param self An instance of BackgroundWriter.
+  def _run(self):
+    q = self._queue;
+    while(True):
+      item = q.get();
+      try:
+        if(item is None):
+          return;
+        item[0](item[1]);
+      except Exception:
+        traceback.print_exc();
+      finally:
+        q.task_done();
+
+  ## @var _queue
+  #  (queue.Queue) The pending (function, message) pairs, None stops the thread.
+
+  ## @var _thread
+  #  (threading.Thread) The thread writing the messages.
+
+  ## @var _closed
+  #  (bool) True once close was called.
+
+## The default _Log context, made on the first get_default_context call.
+_log = None;
 
 ## Obtains the default logging context.
 # @returns The default logging context.
 def get_default_context():
+  global _log;
+  if(_log is None):
+    _log = _Log();
   return _log;
 
+## A _Log with the default settings, new contexts are copies of it. Made on the first new_context call.
+# @note For internal use only.
+_prototype = None;
+
 ## Obtains new logging context.
+#
+# The context is a copy of a prototype with the default settings, __init__ is not run.
+#
 # @returns A new logging context.
 def new_context():
-  return _Log();
+  global _prototype;
+  if(_prototype is None):
+    _prototype = _Log();
+  context = _Log.__new__(_Log);
+  context.info_fn    = _prototype.info_fn;
+  context.warning_fn = _prototype.warning_fn;
+  context.error_fn   = _prototype.error_fn;
+  context.verbosity  = _prototype.verbosity;
+  return context;
+
+## Checks if messages of a verbosity level will be logged by a logging context.
+# @param verbosity (int) The verbosity level of the message.
+# @param context (log._Log) The context to check. Uses the default context if ommited.
+# @returns True if a message with the verbosity level will be logged.
+def is_enabled(verbosity, context=None):
+  if(context is None):
+    context = get_default_context();
+  return verbosity < context.verbosity;
 
 ## Calls the info function of the default logging context.
 # @param message (str) The message to display.
 # @param verbosity (int) The verbosity level associated with this message.
 # @param context (log._Log) The context to call info on. Uses the default context if ommited.
-def info(message, verbosity=0, context=_log):
-  context.info(message, verbosity);
+def info(message, verbosity=0, context=None):
+  if(context is None):
+    context = get_default_context();
+  if(verbosity < context.verbosity):
+    context.info_fn(message);
 
 ## Calls the warning function of the default logging context.
 # @param message (str) The message to display.
 # @param verbosity (int) The verbosity level associated with this message.
 # @param context (log._Log) The context to call info on. Uses the default context if ommited.
-def warning(message, verbosity=0, context=_log):
-  context.warning(message, verbosity);
+def warning(message, verbosity=0, context=None):
+  if(context is None):
+    context = get_default_context();
+  if(verbosity < context.verbosity):
+    context.warning_fn(message);
 
 ## Calls the error function of the default logging context.
 # @param message (str) The message to display.
 # @param verbosity (int) The verbosity level associated with this message.
 # @param context (log._Log) The context to call info on. Uses the default context if ommited.
-def error(message, verbosity=0, context=_log):
-  context.error(message, verbosity);
+def error(message, verbosity=0, context=None):
+  if(context is None):
+    context = get_default_context();
+  if(verbosity < context.verbosity):
+    context.error_fn(message);
@@ -15,19 +15,43 @@
 #   State
 #   Labels
 
+import numpy as np;
+
 import log as log;
-import six as six;
+
+
+## Reduces a long signal to the min and max of each bucket of samples, keeping its envelope.
+#
+# @param x_values (numpy.array) The x value of each sample.
+# @param y_values (numpy.array) The y value of each sample.
+# @param n_buckets (int) The number of buckets, the result has about 2*n_buckets samples.
+#
+# @returns A tuple (x_values, y_values) of the decimated signal.
+def _min_max_decimate(x_values, y_values, n_buckets):
+	bucket = len(y_values) // n_buckets;
+	if(bucket < 2):
+		return (x_values, y_values);
+	n = (len(y_values) // bucket) * bucket;
+	y_buckets = y_values[:n].reshape(-1, bucket);
+	x_result = np.repeat(x_values[:n:bucket], 2);
+	y_result = np.column_stack((y_buckets.min(axis=1), y_buckets.max(axis=1))).ravel();
+	return (np.concatenate((x_result, x_values[n:])), np.concatenate((y_result, y_values[n:])));
 
 
 ## An already compiled Andes Controller sequencer program.
 # @note For read-only use. To build programs use ProgramBuilder
 class Program:
 
+	## Pins with more samples than this (after dropping repeated values) are decimated before plotting.
+	_plot_max_samples = 20000;
+	## Number of min/max buckets decimated pins are reduced to.
+	_plot_n_buckets = 10000;
+
 	## Initializes a compiled program.
 	# @note Do not call direclty, use ProgramBuilder instead.
 	#
 	# @param self An instance of Program
-	# @param codes ([int...]) Binary value of the memory to be written at each index.
+	# @param codes (tuple(int...)) Binary value of the memory to be written at each index.
 	# @param mode_addresses ({str:int...}) Cache of the program's modes location.
 	# @param modes ([sequencer.Mode]) Source modes of the program compiled in codes.
 	# @param log (log._Log) The logging context
@@ -35,6 +59,7 @@ class Program:
 		self.codes = codes;
 		self.address_map = mode_addresses;
 		self.modes = modes;
+		self._mode_by_name = dict([(m.name, m) for m in modes]);
 		self.log = log;
 
 	## Get the location in memory of a mode
@@ -55,13 +80,9 @@ class Program:
 	#
 	# @returns A human-readable string representation of the program.
 	def as_str(self, labels = None):
-		result = [];
-		for c in self.codes:
-			if((c >> 63) == 1):
-				result.append(Mode.format_code(c, self.address_map));
-			else:
-				result.append(State.format_code(c, labels));
-		return '\n'.join(result);
+		address_map = self.address_map;
+		mode_flag = Mode._mode_flag;
+		return '\n'.join(Mode.format_code(c, address_map) if (c & mode_flag) else State.format_code(c, labels) for c in self.codes);
 
 	## Gets all the defined mode names in the program.
 	#
@@ -76,10 +97,10 @@ class Program:
 	#
 	# @returns A mode with the specified name.
 	def get_mode(self, name):
-		for mode in self.modes:
-			if(name == mode.name):
-				return mode;
-		raise ValueError('Mode with name '' + str(name) + '' not found in program.');
+		try:
+			return self._mode_by_name[name];
+		except KeyError:
+			raise ValueError('Mode with name '' + str(name) + '' not found in program.');
 
 	## Alias for self.as_str(None)
 	#
@@ -106,9 +127,26 @@ class Program:
 	# @returns A matplotlib handler.
 	def plot(self, pin_labels = None, start_mode = None, max_cycles = 100000):
 		import matplotlib.pyplot as plots;
+
+		# Long simulations draw faster with simplified paths. The lines take these settings when
+		# they are created, so they only need to be set while plotting, not for the whole process.
+		with plots.rc_context({'path.simplify': True, 'path.simplify_threshold': 1.0}):
+			return self._plot(pin_labels, start_mode, max_cycles);
+
+	## Plots the program modes, see plot.
+	# @note For internal use only.
+	#
+	# @param self An instance of Program
+	# @param pin_labels ({str:int...}/sequencer.Labels) A mapping between pin names and addresses.
+	# @param start_mode (str) The mode in which to start the simulation.
+	# @param max_cycles (int) Maximum length of the simulation.
+	#
+	# @returns A matplotlib handler.
+	def _plot(self, pin_labels, start_mode, max_cycles):
+		import matplotlib.pyplot as plots;
 		import matplotlib.patches as patches;
 		import matplotlib.lines as lines;
-		
+
 		# Determine which modes to plot
 		plot_modes = self.modes;
 		if(start_mode is not None):
@@ -122,12 +160,9 @@ class Program:
 				current_mode = next_mode;
 				next_mode = self.get_mode(current_mode.next_mode_name);
 				
-				mode_time = 0;
+				mode_time = current_mode.get_total_hold_time();
 				mode_multiplier = current_mode.n_loops;
 
-				for state in current_mode.states:
-					mode_time += state.hold_time;
-
 				if(current_mode.n_loops <= 0):
 					plot_modes.append(current_mode);
 					break;
@@ -151,15 +186,17 @@ class Program:
 		current_time = 0;
 		parity = False;
 
+		# Every pin gets a (row, first time, values) tuple. The values array spans the whole
+		# simulation and is filled in place, mode by mode.
+		total_time = sum([mode.get_total_hold_time() for mode in plot_modes]);
 		plot_values = {};
 
 		for mode in plot_modes:
-			current_duration = 0;
-			to_plot = mode._expand_states(pin_labels);
-			for k in to_plot.keys():
-				current_duration = max(current_duration, len(to_plot[k]));
+			(keys, to_plot) = mode._expand_states_array(pin_labels);
+			current_duration = len(to_plot);
+			for k in keys:
 				if(k not in plot_values):
-					plot_values[k] = (len(plot_values), [], []);
+					plot_values[k] = (len(plot_values), current_time, np.zeros(total_time));
 
 			if(parity):
 				pos_y = 0;
@@ -174,24 +211,32 @@ class Program:
 				horizontalalignment='center',
 				verticalalignment='top');
 
-			for k in to_plot.keys():
+			for ii in range(len(keys)):
+				k = keys[ii];
 				axes.text(-0.1 + current_time, plot_values[k][0] + 0.5, k, horizontalalignment='right', verticalalignment='center');
 
-				values = [v*0.9 + plot_values[k][0] for v in to_plot[k]];
-				plot_values[k][1].extend(six.moves.range(current_time, current_time + current_duration));
-				plot_values[k][2].extend(values);
+				values = plot_values[k][2][current_time:(current_time + current_duration)];
+				values[:] = to_plot[:, ii];
+				values *= 0.9;
+				values += plot_values[k][0];
 
 			current_time += current_duration;
 
 		self.log.info('Optimizing plots... ', 2);
 		for pin in plot_values.keys():
-			x_values = plot_values[pin][1];
-			y_values = plot_values[pin][2];
+			first_time = plot_values[pin][1];
+			x_values = np.arange(first_time, current_time);
+			y_values = plot_values[pin][2][first_time:current_time];
 			
 			if(len(y_values) > 1):
-				preserve = [0] + [ii+1 for ii in range(len(y_values) - 2) if y_values[ii] != y_values[ii+1] or y_values[ii+1] != y_values[ii+2]] + [len(y_values) -1];
-				x_values = [x_values[ii] for ii in preserve];
-				y_values = [y_values[ii] for ii in preserve];
+				# Keep the ends and every sample next to a change of value.
+				preserve = np.empty(len(y_values), dtype=bool);
+				preserve[0] = preserve[-1] = True;
+				preserve[1:-1] = (y_values[1:-1] != y_values[:-2]) | (y_values[1:-1] != y_values[2:]);
+				x_values = x_values[preserve];
+				y_values = y_values[preserve];
+				if(len(y_values) > self._plot_max_samples):
+					(x_values, y_values) = _min_max_decimate(x_values, y_values, self._plot_n_buckets);
 				plots.step(x_values, y_values);
 		self.log.info('Done.', 2);
 
@@ -208,11 +253,13 @@ class Program:
 		return fig;
 
 	## @var codes
-	#  ([int...]) Binary value of the memory to be written at each index.
+	#  (tuple(int...)) Binary value of the memory to be written at each index.
 	## @var address_map
 	#  ({str:int...}) Cache of the program's modes location.
 	## @var modes
 	# ([sequencer.Mode]) Source modes of the program compiled in codes.      
+	## @var _mode_by_name
+	# ({str:sequencer.Mode}) The modes of the program by name.
 	## @var log
 	# (log._Log) The logging context
 
@@ -230,6 +277,7 @@ class ProgramBuilder:
 	# @param log The logging context.
 	def __init__(self, log = log.get_default_context()):
 		self.modes = [];
+		self._mode_by_name = {};
 		self.log = log;
 
 	## Adds a mode to the current program
@@ -241,11 +289,12 @@ class ProgramBuilder:
 	def add_mode(self, mode):
 		# Check repeated modes
 		name = mode.name;
-		if(name in self.mode_names()):
+		if(name in self._mode_by_name):
 			raise ValueError('There is already a mode named ' + str(name));
 
 		# Add mode
 		self.modes.append(mode);
+		self._mode_by_name[name] = mode;
 
 	## Gets all the mode names in the program so far.
 	#
@@ -262,10 +311,10 @@ class ProgramBuilder:
 	#
 	# @returns The mode (sequencer.Mode) with the specified name.
 	def get_mode(self, name):
-		for m in self.modes:
-			if m.name == name:
-				return m;
-		raise ValueError('There is no mode named: ' + str(name));
+		try:
+			return self._mode_by_name[name];
+		except KeyError:
+			raise ValueError('There is no mode named: ' + str(name));
 
 	## Creates an Andes Controller sequencer program.
 	#
@@ -286,40 +335,55 @@ class ProgramBuilder:
 
 		# Consistency checks
 		error = False;
+		mode_by_name = self._mode_by_name;
 		for mode in self.modes:
-			try:
-				self.get_mode(mode.next_mode_name);
-			except:
+			if(mode.next_mode_name not in mode_by_name):
 				error = True;
 				self.log.error('Next mode ' + str(mode.next_mode_name) + ' for mode ' + str(mode.name) + ' does not exist.');
 
 			if(mode.is_nested()):
-				try:
-					parent = self.get_mode(mode.parent_mode_name);
-					if(parent.is_nested()):
-						error = True;
-						self.log.error('Double nested modes detected: ' + str(mode.name) + ' in ' + str(parent.name) + ' in ' + str(parent.parent_mode_name) + '.');
-				except:
+				parent = mode_by_name.get(mode.parent_mode_name);
+				if(parent is None):
 					error = True;
 					self.log.error('Parent mode '' + str(mode.parent_mode_name) + '' for mode ' + str(mode.name) + ' does not exist.');
+				elif(parent.is_nested()):
+					error = True;
+					self.log.error('Double nested modes detected: ' + str(mode.name) + ' in ' + str(parent.name) + ' in ' + str(parent.parent_mode_name) + '.');
 
 		if(error):
 			raise ValueError('Compilation stopped because of consistency errors. Check log.');
 
-		codes = [];
-		for mode in self.modes:
-			codes.append( mode.get_code(address_cache) );
-			for state in mode.states:
-				codes.append( state.get_code() );
+		# Check maximum memory length, current_address is the number of lines of the program
+		if current_address > self._max_n_lines:
+			raise ValueError('Compilation stopped because of maximum memory lines restriction (' + str(current_address) + '/' + str(self._max_n_lines) + ')')
 
-		# Check maximum memory length
-		if len(codes) > self._max_n_lines:
-			raise ValueError('Compilation stopped because of maximum memory lines restriction (' + str(len(codes)) + '/' + str(self._max_n_lines) + ')')
+		# Fill the program lines in place, each mode followed by its states.
+		codes = [0] * current_address;
+		for mode in self.modes:
+			address = address_cache[mode.name];
+			state_codes = mode.get_state_codes();
+			codes[address] = mode.get_code(address_cache);
+			codes[(address + 1):(address + 1 + len(state_codes))] = state_codes;
+		codes = tuple(codes);
+
+		# Dump the program in a single message, only formatted when that verbosity is logged.
+		if(self.log.enabled(5)):
+			lines = [];
+			address = 0;
+			for mode in self.modes:
+				lines.append('Mode ' + str(mode.name) + ':');
+				lines.append(Mode.format_code(codes[address], address_cache));
+				for ii in range(len(mode.states)):
+					lines.append(State.format_code(codes[address + 1 + ii]));
+				address += len(mode.states) + 1;
+			self.log.info('\n'.join(lines), 5);
 
 		return Program(codes, address_cache, self.modes, log);
 
 	## @var modes
 	#  ([sequencer.Mode...]): List of registered modes.
+	## @var _mode_by_name
+	#  ({str:sequencer.Mode}): The registered modes by name.
 	## @var log
 	#  (log._Log): The logging context.
 
@@ -327,7 +391,10 @@ class ProgramBuilder:
 
 ## A sequencer mode.
 #
-class Mode:
+class Mode(object):
+	## Every attribute a Mode holds. Instances have no __dict__.
+	__slots__ = ('name', 'n_loops', 'next_mode_name', 'parent_mode_name', 'nested_loops', 'states', '_total_hold_time');
+
 	## Default value of a mode address
 	_invalid_mode = 2**10 -1;
 	## Maximum value n_loops can have
@@ -336,6 +403,10 @@ class Mode:
 	_max_n_loops_nested = 2**16 - 1;
 	## Maximum number of states the mode can have
 	_max_n_states = 2**10 - 1;
+	## The bit set in mode codes (bit 95), state codes leave it clear.
+	_mode_flag = 0x80 << 88;
+	## Pin names used by _expand_states when no labels are given: the address of each pin as str.
+	_default_pin_dir = dict([(str(ii), ii) for ii in range(32)]);
 
 	## Initializes a Mode.
 	#
@@ -354,6 +425,8 @@ class Mode:
 
 		self.next_mode_name = next_mode_name;
 
+		self.parent_mode_name = None;
+		self.nested_loops = 0;
 		if(parent_mode_name):
 			self.parent_mode_name = parent_mode_name;
 			if(not nested_loops):
@@ -363,6 +436,7 @@ class Mode:
 			self.nested_loops = nested_loops;
 
 		self.states = [];
+		self._total_hold_time = 0;
 
 	## Gets the time evolution of the modes states.
 	#
@@ -373,22 +447,34 @@ class Mode:
 	#
 	# @returns A dict {str:[int...]} containing the time evolution of each pin.
 	def _expand_states(self, pin_labels = None):
+		(keys, expanded) = self._expand_states_array(pin_labels);
+		return dict([(keys[ii], expanded[:, ii].tolist()) for ii in range(len(keys))]);
+
+	## Gets the time evolution of the modes states as a matrix.
+	#
+	# Same as _expand_states, but the pin values are the columns of a single array.
+	#
+	# @param self An instance of Mode
+	# @param pin_labels ({str:int...}/sequencer.Labels) A mapping between pin names and addresses.
+	#
+	# @returns A tuple (keys, values): the list of pin names (str) and a numpy.uint8 array
+	# with one row per cycle and one column per pin name.
+	def _expand_states_array(self, pin_labels = None):
 		pin_dir = pin_labels;
 		if(pin_dir is None):
-			pin_dir = {};
-			for ii in range(32):
-				pin_dir[str(ii)] = ii;
+			pin_dir = self._default_pin_dir;
 
-		result = {};
-		for k in pin_dir.keys():
-			result[k] = [];
+		keys = list(pin_dir.keys());
+		if(not self.states):
+			return (keys, np.zeros((0, len(keys)), dtype=np.uint8));
 
-		for state in self.states:
-			for k in pin_dir.keys():
-				pin_value = state.get_value_of_address(pin_dir[k]);
-				result[k].extend([pin_value]*state.hold_time);
+		# One row per state and one column per pin, each row repeated hold_time times.
+		data      = np.array([state.data for state in self.states], dtype=np.uint64);
+		holds     = np.array([state.hold_time for state in self.states], dtype=np.int64);
+		addresses = np.array([pin_dir[k] for k in keys], dtype=np.uint64);
+		bits = ((data[:, None] >> addresses[None, :]) & np.uint64(1)).astype(np.uint8);
 
-		return result;
+		return (keys, np.repeat(bits, holds, axis=0));
 
 	## Appends a state to the end of the mode
 	#
@@ -398,6 +484,19 @@ class Mode:
 		if(len(self.states) >= self._max_n_states):
 			raise ValueError('Number of states per mode limit (' + str(self._max_n_states) + ') reached.');
 		self.states.append(state);
+		self._total_hold_time = None;
+
+	## Gets the number of cycles a run of this mode lasts: the sum of its states hold times.
+	#
+	# The sum is cached until a state is added with add_state or add_states.
+	#
+	# @param self An instance of Mode
+	#
+	# @returns The total hold time (int) of the mode's states.
+	def get_total_hold_time(self):
+		if(self._total_hold_time is None):
+			self._total_hold_time = sum([state.hold_time for state in self.states]);
+		return self._total_hold_time;
 
 	## Appends many states to the end of the mode
 	#
@@ -411,7 +510,7 @@ class Mode:
 	#
 	# @returns True if it has a parent, False otherwise.
 	def is_nested(self):
-		return hasattr(self, 'parent_mode_name');
+		return self.parent_mode_name is not None;
 		
 	## Get the binary data associated with this mode.
 	#
@@ -426,33 +525,40 @@ class Mode:
 	def get_code(self, address_cache):
 		is_nested = 0;
 		nested_loops = 0;
+		parent_address = self._invalid_mode;
 
 		if(self.is_nested()):
 			is_nested = 1;
 			nested_loops = self.nested_loops;
+			parent_address = address_cache[self.parent_mode_name];
 
 		#mode_address = address_cache[self.name];
 		
 		next_address = self._invalid_mode;
 		if(self.next_mode_name):
 			next_address = address_cache[self.next_mode_name];
-		
-		parent_address = self._invalid_mode;
-		if(self.is_nested()):
-			parent_address = address_cache[self.parent_mode_name];
 
-		code = 0;									# 96 bits total (3 x 32 bit words)
-		code = code | parent_address;				# 16 bits
-		code = code | (next_address << 16);			# 16 bits
-		code = code | (is_nested << 32);			#  8 bits
-		code = code | (nested_loops << 40);			# 16 bits
-		code = code | (self.n_loops << 56);			# 16 bits
-		code = code | (len(self.states) << 72);		# 16 bits
-		code = code | (0x80 << 88);					#  8 bits
+		# 96 bits total (3 x 32 bit words)
+		code = (parent_address				# 16 bits
+			| (next_address << 16)			# 16 bits
+			| (is_nested << 32)				#  8 bits
+			| (nested_loops << 40)			# 16 bits
+			| (self.n_loops << 56)			# 16 bits
+			| (len(self.states) << 72)		# 16 bits
+			| self._mode_flag);				#  8 bits
 
-		print '\nMode', self.name, ':\n', self.format_code(code, address_cache)
 		return code;
 
+	## Get the binary data of all the states of this mode.
+	#
+	# Same as calling get_code on each state.
+	#
+	# @param self An instance of Mode
+	#
+	# @returns A list with the binary code (int) of each state.
+	def get_state_codes(self):
+		return [(state.data << 24) | state.hold_time for state in self.states];
+
 	@classmethod
 	## Create a human-redable representation of a mode's code
 	#
@@ -481,20 +587,19 @@ class Mode:
 			for k in addresses.keys():
 				min_str_len_label = max(min_str_len_label, len(k));
 
-			next_label   = '<unknown>';
-			parent_label = '<unknown>';
-
+			# Mode name of each address (the last name wins on repeated addresses).
+			names = {};
 			for k in addresses.keys():
-				if(addresses[k] == parent_address):
-					parent_label = k;
-				if(addresses[k] == next_address):
-					next_label = k;
-				
-				data = ['n_states:' + str(n_states), 'n_loops:' + str(n_loops), 'nested_loops:' + str(nested_loops), 'is_nested:' + str(is_nested), 'next_label:' + str(next_label), 'parent_label:' + str(parent_label)];
-				#data = [1, n_states, n_loops, is_nested, next_label, parent_label, nested_loops];
-				data_str = [conform_str(str(s), min_str_len) for s in data];
-				data_str[4] = conform_str(data_str[4], min_str_len_label);
-				data_str[5] = conform_str(data_str[5], min_str_len_label);
+				names[addresses[k]] = k;
+
+			next_label   = names.get(next_address, '<unknown>');
+			parent_label = names.get(parent_address, '<unknown>');
+
+			data = ['n_states:' + str(n_states), 'n_loops:' + str(n_loops), 'nested_loops:' + str(nested_loops), 'is_nested:' + str(is_nested), 'next_label:' + str(next_label), 'parent_label:' + str(parent_label)];
+			#data = [1, n_states, n_loops, is_nested, next_label, parent_label, nested_loops];
+			data_str = [conform_str(str(s), min_str_len) for s in data];
+			data_str[4] = conform_str(data_str[4], min_str_len_label);
+			data_str[5] = conform_str(data_str[5], min_str_len_label);
 
 		else:
 			data = ['n_states:' + str(n_states), 'n_loops:' + str(n_loops), 'nested_loops:' + str(nested_loops), 'is_nested:' + str(is_nested), 'next_address:' + str(next_address), 'parent_address:' + str(parent_address)];
@@ -510,17 +615,22 @@ class Mode:
 	## @var next_mode_name
 	#  (str) The name of the mode to jump after this mode finishes.
 	## @var parent_mode_name
-	#  (str) The name of the parent mode of this mode (if this mode is nested).
+	#  (str) The name of the parent mode of this mode, None if this mode is not nested.
 	## @var nested_loops
-	#  (int) The number of times to jump to the parent mode before jumping to the next mode.
+	#  (int) The number of times to jump to the parent mode before jumping to the next mode (0 if not nested).
 	## @var states
 	#  ([sequencer.State...]) The states of this mode.
+	## @var _total_hold_time
+	#  (int) Cached sum of the states hold times, None if it has to be computed again.
 
 
 
 ## A sequencer state.
 # Contains information of the pin output values and how much time to hold them.
-class State:
+class State(object):
+	## Every attribute a State holds. Instances have no __dict__.
+	__slots__ = ('data', 'hold_time');
+
 	# Maximum value for hold_time.
 	_max_hold_time = 2**24 - 1;		# In 10 ns increments
 	# Maximum value for states length
@@ -558,16 +668,16 @@ class State:
 	#
 	# @returns A State
 	def from_bits(cls, data_bits, hold_time):
-		bits = [int(bool(bit)) for bit in data_bits];	# Creates a list of 1's and 0's
+		bits = ['1' if bit else '0' for bit in data_bits];	# Creates a list of '1's and '0's
 		if(len(bits) > cls._max_states_length):
 			raise ValueError('Too many bits (' + str(len(bits)) + ') for a sequencer state (max is ' + str(cls._max_states_length) + ').');
 		if(len(bits) < cls._max_states_length):
 			log.warning('There are less bits than the expected in a state (' + str(len(bits) ) + '/' + str(cls._max_states_length) + '), will fill MSBs with 0s.');
 
-		# Generates the binary word
+		# Generates the binary word, bits[0] is the LSB
 		data = 0;
-		for ii in range(len(bits)):
-			data = data | (bits[ii] << ii);
+		if(bits):
+			data = int(''.join(reversed(bits)), 2);
 		return State(data, hold_time);
 
 	@classmethod
@@ -614,6 +724,45 @@ class State:
 			result.append(cls.from_labels(labels, {k:named_bits[k][ii] for k in named_bits.keys()}, hold_times[ii]));
 		return tuple(result);
 
+	@classmethod
+	## Creates multiple states from a table of pin values.
+	#
+	# Same as from_labels_array, but the values come as rows aligned with `names`, so
+	# no dictionary has to be built for each state. Row `bits[ii]` holds the values of pin
+	# `names[ii]` for every state, its length must match `len(hold_times)`.
+	#
+	# @note This is a class method.
+	#
+	# @param cls An instance of Mode class
+	# @param labels ({str:int...}) The address of each pin name.
+	# @param names (tuple(str)) The pin name of each row of bits.
+	# @param bits (tuple(tuple(int/str))) The values of each pin, one row per name.
+	# @param hold_times (tuple(int)): The number of cycles this state holds the data for each state.
+	#
+	# @returns A tuple containing States
+	def from_bits_array(cls, labels, names, bits, hold_times):
+		length = len(hold_times);
+		if(len(names) != len(bits)):
+			raise ValueError('Number of names (' + str(len(names)) + ') does not match the number of rows of bits (' + str(len(bits)) + ').');
+		for ii in range(len(names)):
+			if(len(bits[ii]) != length):
+				raise ValueError('Length of label ' + str(names[ii]) + ' (' + str(len(bits[ii])) + ') does not match length of hold_times (' + str(length) + ').');
+
+		masks = [];
+		for k in names:
+			if(labels[k] >= cls._max_states_length):
+				raise ValueError('Address of label ' + str(k) + ' (' + str(labels[k]) + ') is out of range [0...' + str(cls._max_states_length - 1) + '].');
+			masks.append(1 << labels[k]);
+
+		result = [];
+		for jj in range(length):
+			data = 0;
+			for ii in range(len(masks)):
+				if(bits[ii][jj]):
+					data = data | masks[ii];
+			result.append(cls(data, hold_times[jj]));
+		return tuple(result);
+
 	@classmethod
 	## Create a human-redable representation of a state's code
 	#
@@ -623,7 +772,7 @@ class State:
 	#
 	# @param cls An instance of Mode class
 	# @param code (int) The code to represent
-	# @param labels ({str:int...}) The name of each pin.
+	# @param labels ({str:int...}/sequencer.Labels) The name of each pin.
 	#
 	# @returns A human-readable representation (str) of a state's code
 	def format_code(cls, code, labels = None):
@@ -631,21 +780,26 @@ class State:
 		#time = (code & 0x7FFFFF80) >> 7;
 		data = (code & 0x7FFFFFFF80000000) >> 31;
 		time = (code & 0xFFFFFF);
-		data_array = [''] * 32;
-		for ii in range(32):
-			data_array[ii] = (data >> ii) & 1;
-			if(labels is None):
-				data_array[ii] = str(data_array[ii]);
-			else:
-				label = None;
-				for k in labels.keys():
-					if(labels[k] == ii):
-						label = str(k);
-						break;
+
+		# Pin name of each address (the first name wins on repeated addresses).
+		names = None;
+		if(isinstance(labels, Labels)):
+			names = labels.reversed();
+		elif(labels is not None):
+			names = {};
+			for k in labels.keys():
+				names.setdefault(labels[k], k);
+
+		# The 32 bits as '0'/'1' characters, LSB first.
+		bits = format(data, '032b')[::-1];
+		if(names is None):
+			data_array = list(bits);
+		else:
+			data_array = [None] * 32;
+			for ii in range(32):
+				label = names.get(ii);
 				if(label != None):
-					data_array[ii] = str(label) + ':' + str(data_array[ii]) + '\n';
-				else:
-					data_array[ii] = None;
+					data_array[ii] = str(label) + ':' + bits[ii] + '\n';
 		if(labels):
 			data_array = ['---- hold for: ' + str(time) + ' ----- \n'] + [d for d in data_array if d];
 		else:
@@ -664,7 +818,6 @@ class State:
 	#	name verilog	|	  0		|		  SEQ		  |	CURRENT_HOLD_TIME  |
 	def get_code(self):
 		code = (self.data << 24) | (self.hold_time);
-		print self.format_code(code)
 		return code
 
 
@@ -685,20 +838,21 @@ class Labels:
 	# @param self An instance of Labels
 	# @param labels ({str:int...}): The address of each pin name.
 	def __init__(self, labels):
-		seen_values = [];
+		reverse = {};
 		repeated_keys = [];
 		for k in labels.keys():
 			v = labels[k];
-			if(v in seen_values):
+			if(v in reverse):
 				repeated_keys.append(k);
 			else:
-				seen_values.append(v);
+				reverse[v] = k;
 
 		if(len(repeated_keys) > 0):
 			repeated_strs = [str(k) + ':' + str(labels[k]) for k in repeated_keys];
 			raise ValueError('There are repeated indexes for labels: ' + ','.join(repeated_strs));
 
 		self.labels = labels;
+		self._reverse = reverse;
 
 	## Gets the address associated with a name
 	#
@@ -716,19 +870,30 @@ class Labels:
 	#
 	# @returns The label (str) associated with the address
 	def label_of(self, address):
-		for k in self.labels.keys():
-			if(address == self.labels[k]):
-				return k;
-		raise ValueError('There is no label for address ' + str(address));
+		try:
+			return self._reverse[address];
+		except KeyError:
+			raise ValueError('There is no label for address ' + str(address));
+
+	## Gets the name of each address.
+	#
+	# @param self An instance of Labels
+	#
+	# @returns A dict {int:str} with the label of each address.
+	# @note The dict is shared, do not modify it.
+	def reversed(self):
+		return self._reverse;
 
 	## @var labels
 	#  ({str:int...}): The address of each pin name.
+	## @var _reverse
+	#  ({int:str...}): The pin name of each address.
 
 
 
 
 if __name__ == '__main__':
 
-	print '\n*** Testing sequencer.State ***\n'
+	print('\n*** Testing sequencer.State ***\n')
 	x = State.from_bits([1,1,1,1,0,0,0,0], 22)
-	print x.format_code( x.get_code() )
+	print(x.format_code( x.get_code() ))
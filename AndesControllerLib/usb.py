@@ -12,8 +12,9 @@
 # Classes:  _AsyncWriter, _AsyncReader, _TransferCollector, Port, Device
 
 
+import ctypes as ctypes
+import threading as threading
 import usb1 as usb
-import six as six
 
 ## For libusb1 status human-readable printing. For internal use only.
 transfer_status_dict = \
@@ -27,6 +28,20 @@ transfer_status_dict = \
 	usb.TRANSFER_OVERFLOW  : 'TRANSFER_OVERFLOW' \
 };
 
+## Gets the memory address of a buffer.
+# @note For internal use only.
+#
+# @param buffer A ctypes array or a writable buffer of bytes.
+#
+# @returns The address (int), or None if it can not be taken (e.g. memoryviews on python 2).
+def _buffer_address(buffer):
+	if(isinstance(buffer, ctypes.Array)):
+		return ctypes.addressof(buffer);
+	try:
+		return ctypes.addressof((ctypes.c_char*len(buffer)).from_buffer(buffer));
+	except (TypeError, ValueError):
+		return None;
+
 
 
 ## Callback to send succesive transfer calls
@@ -39,22 +54,23 @@ class _AsyncWriter:
 	# @param original_data (str or bytes) The data to transfer, will be chuncked
 	# @param buffer_size (int) The size of bytes to transfer per bulk transfer 
 	def __init__(self, original_data, buffer_size):
-		self.pending_transfers = [];
-		# Slice data in buffer_size
-		for ii in six.moves.range(0, len(original_data), buffer_size):
-			data = original_data[ii:(ii+buffer_size)];
-			self.pending_transfers.append(''.join(data));
-		# Reverse order for LIFO access (using pop())
-		self.pending_transfers = reversed(pending_transfers);
+		self.data = memoryview(original_data);
+		self.offset = 0;
+		self.buffer_size = buffer_size;
+		self.total_size = len(original_data);
+		self.failed_status = None;
 
 	## Gets next bytes to transfer or None if empty
 	#
 	# @param self An instance of _AsyncWriter
+	#
+	# @returns A memoryview of the next chunk of data, or None.
 	def _next_bytes(self):
-		if(len(self.pending_transfers) == 0):
+		if(self.offset >= self.total_size):
 			return None;
-		else:
-			return self.pending_transfers.pop();
+		chunk = self.data[self.offset:(self.offset + self.buffer_size)];
+		self.offset += len(chunk);
+		return chunk;
 
 	## Prepares a transfer and (re)sumbits it.
 	#
@@ -62,7 +78,7 @@ class _AsyncWriter:
 	# @param transfer (libusb1.Transfer) The transfer object to prepare.
 	def prepare_next_transfer(self, transfer):
 		data = self._next_bytes();
-		if(data):
+		if(data is not None):
 			transfer.setBuffer(data);
 			transfer.submit();
 
@@ -72,48 +88,196 @@ class _AsyncWriter:
 	#
 	# @returns None (since is a write operation)
 	def get_result(self):
+		self._check_failed();
 		return None;
 
+	## Raises if a transfer did not complete, like a synchronous write would.
+	#
+	# @param self An instance of _AsyncWriter
+	def _check_failed(self):
+		if(self.failed_status is not None):
+			raise RuntimeError('Bulk write failed (transfer status ' + str(self.failed_status) + ').');
+
 	## Process the transfer every time it has a status update
 	#
+	# Once a transfer fails, no more data is submitted.
+	#
 	# @param self An instance of _AsyncWriter
 	# @param transfer (libusb1.Transfer) The transfer object to process.
 	def __call__(self, transfer):
 		if(transfer.getStatus() != usb.TRANSFER_COMPLETED):
-			return;
-		else:
+			if(self.failed_status is None):
+				self.failed_status = transfer.getStatus();
+		elif(self.failed_status is None):
 			self.prepare_next_transfer(transfer);
 	
-	## @var pending_transfers
-	# A LIFO list of the data still to be transfered ([str...])
+	## @var data
+	# (memoryview) A view of the data to transfer, chunks are sliced from it without copies.
+	## @var offset
+	# (int) Offset of the first byte not yet handed to a transfer.
+	## @var buffer_size
+	# (int) The size of bytes to transfer per bulk transfer.
+	## @var total_size
+	# (int) The size of the data to transfer.
+	## @var failed_status
+	# (int) Status of the first transfer that did not complete, None if all did.
+
+
+
+## Callback to send a list of lines, one line per transfer
+# Use with _TransferCollector as a async_process
+#
+# Unlike _AsyncWriter, lines are never merged or split, so each one reaches the device as a
+# transfer of its own.
+class _AsyncLinesWriter(_AsyncWriter):
+
+	## Initializes a _AsyncLinesWriter.
+	#
+	# @param self An instance of _AsyncLinesWriter
+	# @param lines ([str or bytes...]) The lines to transfer, in order.
+	def __init__(self, lines):
+		self.lines = lines;
+		self.index = 0;
+		self.sent  = 0;
+		self.failed_status = None;
+
+	## Gets the next line to transfer or None if empty
+	#
+	# @param self An instance of _AsyncLinesWriter
+	#
+	# @returns The next line, or None.
+	def _next_bytes(self):
+		if(self.index >= len(self.lines)):
+			return None;
+		line = self.lines[self.index];
+		self.index += 1;
+		return line;
+
+	## Get the results of the transfer
+	#
+	# @param self An instance of _AsyncLinesWriter
+	#
+	# @returns The number of bytes sent (int).
+	def get_result(self):
+		self._check_failed();
+		return self.sent;
+
+	## Process the transfer every time it has a status update
+	#
+	# Once a transfer fails, no more lines are submitted.
+	#
+	# @param self An instance of _AsyncLinesWriter
+	# @param transfer (libusb1.Transfer) The transfer object to process.
+	def __call__(self, transfer):
+		if(transfer.getStatus() != usb.TRANSFER_COMPLETED):
+			if(self.failed_status is None):
+				self.failed_status = transfer.getStatus();
+			return;
+		self.sent += transfer.getActualLength();
+		if(self.failed_status is None):
+			self.prepare_next_transfer(transfer);
+
+	## @var lines
+	# ([str or bytes...]) The lines to transfer.
+	## @var index
+	# (int) Index of the first line not yet handed to a transfer.
+	## @var sent
+	# (int) Number of bytes sent so far.
+	## @var failed_status
+	# (int) Status of the first transfer that did not complete, None if all did.
 
 
 
 ## Callback to accumulate succesive transfer calls
 # Use with _TransferCollector as a async_process
+#
+# If the total size to read is known, the data is received straight into a single
+# preallocated buffer: each transfer is handed a memoryview slice of it.
+# The buffer may also be supplied by the caller, to reuse it across reads.
 class _AsyncReader:
 
 	## Initializes a _AsyncReader.
 	#
 	# @param self An instance of _AsyncReader
-	def __init__(self):
+	# @param total_size (int) Number of bytes to read. None to read until transfers stop, or the whole buffer if given.
+	# @param buffer (bytearray) Buffer to receive the data into, instead of allocating one. None to allocate it.
+	# Any writable one dimensional buffer of bytes works, like a numpy uint8 array.
+	def __init__(self, total_size = None, buffer = None):
 		self.transfers = [];
+		self.buffer = None;
+		if(buffer is not None):
+			if(total_size is None):
+				total_size = len(buffer);
+			elif(total_size > len(buffer)):
+				raise ValueError('Buffer too small (' + str(len(buffer)) + ' bytes) to read ' + str(total_size) + ' bytes.');
+		elif(total_size is not None):
+			buffer = bytearray(total_size);
+		self.total_size = total_size;
+		if(total_size is not None):
+			self.buffer = buffer;
+			self.view = memoryview(self.buffer);
+			self.address = _buffer_address(self.buffer);
+			self.slices = {};
+			self.next_offset = 0;
+		self.offset = 0;
 
 	## Prepares a transfer and (re)sumbits it.
 	#
+	# When reading into the preallocated buffer, the transfer gets the next free slice.
+	# No transfer is submitted once the whole buffer has been handed out.
+	#
 	# @param self An instance of _AsyncReader
 	# @param transfer (libusb1.Transfer) The transfer object to prepare.
 	def prepare_next_transfer(self, transfer):
+		if(self.buffer is None):
+			transfer.submit();
+			return;
+
+		if(self.next_offset >= self.total_size):
+			return;
+		length = min(len(transfer.getBuffer()), self.total_size - self.next_offset);
+		view = self.view[self.next_offset:(self.next_offset + length)];
+		transfer.setBuffer(view);
+		self.slices[id(transfer)] = (self.next_offset, view);
+		self.next_offset += length;
 		transfer.submit();
 
 	## Get the results of the transfer
 	#
 	# @param self An instance of _AsyncReader
 	#
-	# @returns The recieved data (str or bytes)
+	# @returns The recieved data (str or bytes). The preallocated (or supplied) buffer itself when it was
+	# filled, a copy of its received part (bytearray) when less data arrived.
 	def get_result(self):
-		result = [byte for data in self.transfers for byte in data];
-		return ''.join(result);
+		if(self.buffer is not None):
+			if(self.offset < len(self.buffer)):
+				return self.buffer[:self.offset];
+			return self.buffer;
+
+		return b''.join(self.transfers);
+
+	## Stores the data of a finished transfer.
+	#
+	# Transfers complete in submission order. If a previous transfer came back short,
+	# its successors are moved down so the received data stays contiguous.
+	#
+	# @param self An instance of _AsyncReader
+	# @param transfer (libusb1.Transfer) The finished transfer.
+	def _store(self, transfer):
+		length = transfer.getActualLength();
+		if(self.buffer is None):
+			self.transfers.append(bytes(transfer.getBuffer()[:length]));
+			return;
+
+		start, view = self.slices.pop(id(transfer));
+		received = transfer.getBuffer();
+		# getBuffer may wrap the slice in a new object, so the memory is compared, not the objects.
+		if(received is not view and (self.address is None or _buffer_address(received) != self.address + start)):
+			# This libusb1 could not use the slice in place, it received into its own buffer.
+			self.view[start:(start + length)] = received[:length];
+		if(start != self.offset):
+			self.buffer[self.offset:(self.offset + length)] = self.buffer[start:(start + length)];
+		self.offset += length;
 
 	## Process the transfer every time it has a status update
 	#
@@ -123,11 +287,25 @@ class _AsyncReader:
 		if(transfer.getStatus() != usb.TRANSFER_COMPLETED):
 			return;
 		else:
-			self.transfers.append(transfer.getBuffer()[:transfer.getActualLength()]);
-			transfer.submit();
+			self._store(transfer);
+			self.prepare_next_transfer(transfer);
 
 	## @var transfers
-	# A FIFO list of the data recieved ([str...])
+	# A FIFO list of the data recieved ([str...]), used when total_size is None.
+	## @var total_size
+	# (int) Number of bytes to read, or None.
+	## @var buffer
+	# (bytearray) The preallocated (or supplied, may be a numpy uint8 array) buffer the data is received into, or None.
+	## @var view
+	# (memoryview) A view of buffer, to hand out slices without copies.
+	## @var address
+	# (int) The memory address of buffer, or None if it could not be taken.
+	## @var slices
+	# ({int:(int, memoryview)}) The offset and slice of each submitted transfer, by transfer id.
+	## @var next_offset
+	# (int) Offset of the next slice to hand out.
+	## @var offset
+	# (int) Number of bytes received in the preallocated buffer.
 
 
 
@@ -152,6 +330,9 @@ class _TransferCollector:
 	def __init__(self, transfer_size, pararell_transfers, port, async_process):
 		self.processor = async_process;
 		self.port = port;
+		self.done = threading.Event();
+		# Callbacks may run on the device event thread, serialize them with the queuing below.
+		self.lock = threading.Lock();
 		transfers = [];
 
 		# Queue transfers
@@ -160,34 +341,84 @@ class _TransferCollector:
 			transfer.setBulk(
 				port.address,
 				transfer_size,
-				callback=self.processor,
+				callback=self._process,
 				timeout=port.timeout );
-			async_process.prepare_next_transfer(transfer);
 			transfers.append(transfer);
 		self.transfers = transfers;
 
+		with self.lock:
+			for transfer in transfers:
+				async_process.prepare_next_transfer(transfer);
+			self._check_done();
+
+	## Flags the collection as done if there are no active transfers left.
+	#
+	# @param self An instance of _TransferCollector
+	def _check_done(self):
+		if(not any(x.isSubmitted() for x in self.transfers)):
+			self.done.set();
+
+	## Transfer callback, forwards the transfer to the processor.
+	#
+	# @param self An instance of _TransferCollector
+	# @param transfer (libusb1.Transfer) The transfer which status changed.
+	def _process(self, transfer):
+		with self.lock:
+			self.processor(transfer);
+			self._check_done();
+
 	## Activate data collection / send
 	#
+	# If the device is pumping USB events on its own thread, this just waits for the
+	# transfers to finish. Otherwise events are handled on the calling thread.
+	#
 	# @param self An instance of _TransferCollector
 	#
 	# @returns The result of the transaction. Depending on self.processor
 	# @see _AsyncReader
 	# @see _AsyncWriter
 	def __call__(self):
-		# Collect tranfers with _AsyncReader while there are active transfers.
-		while any(x.isSubmitted() for x in self.transfers):
-			try:
-				self.port.device.context.handleEvents();
-			except usb.USBErrorInterrupted:
-				pass;
+		self._wait();
 		return self.processor.get_result();
 
+	## Waits until there are no active transfers left.
+	#
+	# @param self An instance of _TransferCollector
+	def _wait(self):
+		if(self.port.device.is_pumping_events()):
+			# Wait in steps, a wait without timeout can not be interrupted on python 2.
+			while(not self.done.wait(0.1)):
+				pass;
+		else:
+			# Collect tranfers with _AsyncReader while there are active transfers.
+			while(not self.done.is_set()):
+				try:
+					self.port.device.context.handleEvents();
+				except usb.USBErrorInterrupted:
+					pass;
+
+	## Cancels the transfers still in flight and waits for them to come back.
+	#
+	# @param self An instance of _TransferCollector
+	def cancel(self):
+		for transfer in self.transfers:
+			if(transfer.isSubmitted()):
+				try:
+					transfer.cancel();
+				except usb.USBErrorNotFound:
+					pass;
+		self._wait();
+
 	## @var processor
 	# An asynchronous processor as described on this class.
 	## @var port
 	# The port (usb.Port) in which the transactions are taking place.
 	## @var transfers
 	# ([libusb1.Transfer]) The quequed transfers of this collector.
+	## @var done
+	# (threading.Event) Set when there are no active transfers left.
+	## @var lock
+	# (threading.Lock) Serializes the processor calls.
 
 
 
@@ -209,6 +440,23 @@ class Port:
 		if(timeout is None):
 			self.timeout = 0;
 
+		self.optimal_transfer_size = device.get_optimal_transfer_size(address);
+		self.max_packet_size = device.get_max_packet_size(address);
+
+	## Rounds a transfer length up to a multiple of the endpoint maximum packet size.
+	#
+	# Bulk IN transfers of whole packets are scheduled back to back by the host controller.
+	# It only rounds the transfer length: when reading a total size into a preallocated buffer
+	# (see read_async), the last transfer gets the remainder, which may end in a partial packet.
+	#
+	# @param self An instance of Port
+	# @param length (int) The length (in bytes) to round.
+	#
+	# @returns The rounded length (int).
+	def round_to_packets(self, length):
+		packet = self.max_packet_size;
+		return ((length + packet - 1) // packet) * packet;
+
 	## Perform a synchronous read
 	#
 	# @param self An instance of Port
@@ -228,15 +476,49 @@ class Port:
 	def write_sync(self, data):
 		return self.device.dev.bulkWrite(self.address, data, timeout=self.timeout);
 
+	## Perform a asynchronous write of several lines, one bulk transfer per line
+	#
+	# Up to pararell_transfers lines are in flight at once, so the lines go out back to back
+	# instead of waiting for each write to complete. Call the returned collector to wait until
+	# all the lines are sent.
+	#
+	# @param self An instance of Port
+	# @param lines ([str or bytes...]) The lines to send, in order.
+	# @param pararell_transfers (int) Number of pararel transfers.
+	#
+	# @returns A _TransferCollector, calling it waits for the write to finish and returns the number of bytes sent.
+	def write_lines_async(self, lines, pararell_transfers = 8):
+		lines = list(lines);
+		transfer_size = max([len(line) for line in lines] + [1]);
+		return _TransferCollector(transfer_size, min(pararell_transfers, len(lines)), self, _AsyncLinesWriter(lines));
+
 	## Perform a asynchronous read
 	#
 	# @param self An instance of Port
-	# @param length (int) Size of each transfer
+	# @param length (int) Size of each transfer. If None, optimal_transfer_size is used.
 	# @param pararell_transfers (int) Number of pararel transfers.
+	# @param total_size (int) Total number of bytes to read. If given, the data is received into a single preallocated buffer.
+	# @param buffer (bytearray) Buffer to receive into, reused instead of allocating one. total_size defaults to its length.
 	#
 	# @returns The read data (str or bytes)
-	def read_async(self, length, pararell_transfers = 32):
-		return _TransferCollector(length, pararell_transfers, self, _AsyncReader());
+	def read_async(self, length = None, pararell_transfers = 32, total_size = None, buffer = None):
+		if(length is None):
+			length = self.optimal_transfer_size;
+		return _TransferCollector(length, pararell_transfers, self, _AsyncReader(total_size, buffer));
+
+	## Perform a asynchronous write
+	#
+	# The transfers are submitted right away, call the returned collector to wait until all the data is sent.
+	# Meanwhile the caller is free to queue reads or other work.
+	#
+	# @param self An instance of Port
+	# @param data (str or bytes) Data to send
+	# @param length (int) Size of each transfer
+	# @param pararell_transfers (int) Number of pararel transfers.
+	#
+	# @returns A _TransferCollector, calling it waits for the write to finish.
+	def write_async(self, data, length = 512, pararell_transfers = 4):
+		return _TransferCollector(length, pararell_transfers, self, _AsyncWriter(data, length));
 
 	## @var device
 	#  (usb.Device) The device this port belongs.
@@ -244,6 +526,10 @@ class Port:
 	#  (int) Port address.
 	## @var timeout
 	#  (float) Timeout (in seconds) for transactions done with this port.
+	## @var optimal_transfer_size
+	#  (int) The transfer size (in bytes) that best suits this port's endpoint.
+	## @var max_packet_size
+	#  (int) The maximum packet size (in bytes) of this port's endpoint.
 
 
 
@@ -251,6 +537,11 @@ class Port:
 # It must be used in a context manager fashion. See <a href='https://www.python.org/dev/peps/pep-0343/'>Context managers</a>. 
 class Device:
 
+	## Maximum packet size assumed for endpoints not described by the device (high speed bulk).
+	_default_max_packet_size = 512;
+	## Number of maximum size packets in an optimal transfer.
+	_packets_per_transfer = 128;
+
 	## Initializes a Device.
 	#
 	# @param self An instance of Device
@@ -273,13 +564,27 @@ class Device:
 
 		self.interface_handle = self.dev.claimInterface(self.interface);
 
+		# Cache the maximum packet size of each endpoint of the interface
+		self.max_packet_sizes = {};
+		for setting in self.dev.getDevice().iterSettings():
+			if(setting.getNumber() == self.interface):
+				for endpoint in setting:
+					self.max_packet_sizes[endpoint.getAddress()] = endpoint.getMaxPacketSize() & 0x7FF;
+
+		self._running = False;
+		self._evt_thread = None;
+
 	## Context manager __enter__ method
 	#
-	# It adquires the interface of the device.
+	# It adquires the interface of the device and starts handling USB events on a separate thread.
 	#
 	# @param self An instance of Device
 	def __enter__(self):
 		self.interface_handle.__enter__();
+		self._running = True;
+		self._evt_thread = threading.Thread(target = self._pump_events);
+		self._evt_thread.daemon = True;
+		self._evt_thread.start();
 		return self;
 
 	## Context manager __exit__ method
@@ -291,10 +596,55 @@ class Device:
 	# @param exception_value The object of the raised exception. None if no error happened.
 	# @param traceback The stack information of the raised exception. None if no error happened.
 	def __exit__(self, exception_type, exception_value, traceback):
+		self._running = False;
+		if(self._evt_thread is not None):
+			self._evt_thread.join();
+			self._evt_thread = None;
 		self.interface_handle.__exit__(exception_type, exception_value, traceback);
 		if(hasattr(self, 'backend')):
 			self.backend.__exit__(exception_type, exception_value, traceback);
 
+	## Handles USB events continuously, so transfers are resubmitted as soon as they complete.
+	#
+	# Runs on its own thread between __enter__ and __exit__.
+	#
+	# @param self An instance of Device
+	def _pump_events(self):
+		while(self._running):
+			try:
+				self.context.handleEventsTimeout(0.05);
+			except usb.USBErrorInterrupted:
+				pass;
+
+	## Tells if USB events are being handled on the device's own thread.
+	#
+	# @param self An instance of Device
+	#
+	# @returns True if the event thread is running, False otherwise.
+	def is_pumping_events(self):
+		return self._evt_thread is not None;
+
+	## Gets the transfer size that best suits an endpoint.
+	#
+	# It is a multiple of the endpoint maximum packet size, so the host controller can
+	# fill every (micro)frame without splitting packets.
+	#
+	# @param self An instance of Device.
+	# @param address (int) Endpoint address.
+	#
+	# @returns The transfer size (int) in bytes.
+	def get_optimal_transfer_size(self, address):
+		return self.get_max_packet_size(address) * self._packets_per_transfer;
+
+	## Gets the maximum packet size of an endpoint.
+	#
+	# @param self An instance of Device.
+	# @param address (int) Endpoint address.
+	#
+	# @returns The maximum packet size (int) in bytes.
+	def get_max_packet_size(self, address):
+		return self.max_packet_sizes.get(address, self._default_max_packet_size);
+
 	## Opens a port for sending / recieving data.
 	#
 	# @param self An instance of Device.
@@ -315,3 +665,9 @@ class Device:
 	#  (libusb1.Device) The libusb1 device object this device is simplifying
 	## @var interface_handle
 	#  (libusb1.Interface) The libusb1 interface object this device is using on __enter__ and __exit__
+	## @var max_packet_sizes
+	#  ({int:int...}) The maximum packet size of each endpoint of the interface, by address.
+	## @var _running
+	#  (bool) Keeps the event thread running while True.
+	## @var _evt_thread
+	#  (threading.Thread) The thread handling USB events, None when not running.
@@ -9,6 +9,11 @@ from __future__ import print_function;
 
 import AndesControllerLib.cam as camLib
 import matplotlib.image as images
+import threading;
+try:
+	import queue;
+except ImportError:
+	import Queue as queue;
 
 # All this imports are only to be able to detect a keystroke.
 import select;
@@ -30,6 +35,24 @@ cam.shutter.open = True;			# Open state of the shutter during exposition.
 def hasKey():
 	return select.select([sys.stdin], [], [], 0) == ([sys.stdin], [], [])
 
+### Images are encoded and saved in the background, while the next one is taken ###
+def saveImages(pending):
+	while(True):
+		item = pending.get();
+		if(item is None):
+			return;
+		n, image = item;
+		# Keep draining the queue on errors, otherwise the capture loop would block on a full queue.
+		try:
+			images.imsave('./plot_example_' + str(n) + '.png', image, cmap='gray');
+		except Exception as e:
+			print('\nCould not save image ' + str(n) + ': ' + str(e));
+
+pending_images = queue.Queue(maxsize = 4);
+saver = threading.Thread(target = saveImages, args = (pending_images,));
+saver.daemon = True;
+saver.start();
+
 old_settings = termios.tcgetattr(sys.stdin)
 tty.setcbreak(sys.stdin.fileno());
 
@@ -52,8 +75,8 @@ try:
 		print('\rPictures taken ' + str(total_pictures) + ', press any key to stop... (after finishing this image)', end = '');
 		sys.stdout.flush();
 
-		image = cam.take_picture();
-		images.imsave('./plot_example_' + str(total_pictures) + '.png', image, cmap='gray');
+		image = cam.take_picture(native = False);	# Only saved, no need for native byte order
+		pending_images.put((total_pictures, image));
 
 		total_pictures += 1;
 		exit = hasKey();
@@ -63,5 +86,9 @@ except:
 
 finally:
 	termios.tcsetattr(sys.stdin, termios.TCSADRAIN, old_settings);
+	# Wait for the pending images to be saved.
+	if(saver.is_alive()):
+		pending_images.put(None);
+		saver.join();
 
 print('\nProgram completed.');
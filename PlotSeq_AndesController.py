@@ -2,6 +2,7 @@
 # -*- coding: UTF-8 -*-
 #
 
+import sys
 import matplotlib.pyplot as plots
 import AndesControllerLib.ccd as ccd
 import AndesControllerLib.binary as binary
@@ -35,8 +36,9 @@ plot = program.plot( \
 # Mostrar todos los modos.
 plot = program.plot(pin_labels = ccd.clock_pins) #, order = ccd.clock_order);
 
-for mode in program.modes:
-	print mode.name, program.get_address(mode.name);
+# Direcciones de todos los modos, en una sola escritura.
+address_map = program.address_map;
+sys.stdout.write(''.join([mode.name + ' ' + str(address_map[mode.name]) + '\n' for mode in program.modes]));
 
 formatter = binary.ByteCode();
 byte_code = ccd.get_configuration_bytecode(formatter)
@@ -1,18 +1,22 @@
 
 
+import numpy as np
+
 with open('init_file.init') as f:
 	lines = f.readlines()
 
+tokens = [line.split()[1:] for line in lines]
+
+# Every hex word is converted at once: big endian words, unpacked into bits, shifted to '0'/'1'
+words = np.array([int(v,16) for x in tokens for v in x], dtype='>u4')
+bits = np.unpackbits(words.view(np.uint8)) + np.uint8(ord('0'))
+b = bits.view('S32').astype(str)
+
 res = []
-for line in lines:
-	x = line.split()
-	l = []
-	for v in x[1:]:
-		b = bin( int(v,16) )[2:]
-		b = '0'*(32-len(b)) + b
-		l.append(b)
-	
-	res.append(' '.join(l))
+i = 0
+for x in tokens:
+	res.append(' '.join(b[i:i+len(x)]))
+	i += len(x)
 
 s = '\n'.join(res)
 